@@ -3,6 +3,38 @@ import tkinter as tk
 from tkinter import scrolledtext
 import time
 import random
+import math
+import os
+
+import metrics
+from dispatch import UIDispatcher
+from profiler import RequestProfiler
+from scrollback import Scrollback
+from stallwatch import StallWatchdog
+from tkasync import TkAsyncLoop
+
+class FrameHistogram:
+    """Bucketed frame-time counts for debugging animation smoothness"""
+    EDGES_MS = (8, 17, 25, 34, 50, 100)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.EDGES_MS) + 1)
+        self.total = 0
+        self.worst_ms = 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        i = 0
+        while i < len(self.EDGES_MS) and ms >= self.EDGES_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += 1
+        self.worst_ms = max(self.worst_ms, ms)
+
+    def summary(self):
+        labels = [f"<{e}ms" for e in self.EDGES_MS] + [f">={self.EDGES_MS[-1]}ms"]
+        parts = [f"{label}: {n}" for label, n in zip(labels, self.counts) if n]
+        return f"{self.total} frames, worst {self.worst_ms:.1f}ms | " + ", ".join(parts)
 
 class CatMind:
     def __init__(self):
@@ -26,11 +58,29 @@ class CatMind:
         return random.choice(self.knowledge['responses'][category])
 
 class CatSeekGUI:
+    # One bob cycle of the cat sprite, precomputed so frames only index a table
+    BOB_OFFSETS = tuple(round(10 * (1 + math.sin(2 * math.pi * i / 60))) for i in range(60))
+    BOB_CYCLE_S = 1.0
+    FRAME_MIN_S = 1 / 60
+    FRAME_MAX_S = 1 / 20
+
     def __init__(self, master):
         self.master = master
         master.title("CATSEEK R1")
         master.geometry("600x400")
         master.resizable(False, False)
+        self.ui = UIDispatcher(master)
+        self.watchdog = StallWatchdog.install_from_env(master)  # opt-in: CATGPT_WATCHDOG=1
+        self.aio = TkAsyncLoop(self.ui)
+        self.profiler = RequestProfiler.install_from_env()  # CATGPT_PROFILE=1 or Diagnostics menu
+
+        menubar = tk.Menu(master)
+        diagnostics = tk.Menu(menubar, tearoff=0)
+        self.profile_var = tk.BooleanVar(value=self.profiler.enabled)
+        diagnostics.add_checkbutton(label="Profile replies (flamegraph)", variable=self.profile_var,
+                                    command=lambda: setattr(self.profiler, "enabled", self.profile_var.get()))
+        menubar.add_cascade(label="Diagnostics", menu=diagnostics)
+        master.config(menu=menubar)
         
         # Configure main container
         self.frame = tk.Frame(master, bg="#1e1e1e")
@@ -42,6 +92,7 @@ class CatSeekGUI:
             font=("Consolas", 10), insertbackground="white"
         )
         self.chat_display.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+        self.scrollback = Scrollback(self.chat_display)
         
         # Input controls
         input_frame = tk.Frame(self.frame, bg="#1e1e1e")
@@ -66,6 +117,7 @@ class CatSeekGUI:
         
         self.mind = CatMind()
         self.imagination_running = False
+        self.frame_histogram = FrameHistogram()
 
     def send_message(self):
         user_text = self.user_input.get().strip()
@@ -75,18 +127,23 @@ class CatSeekGUI:
         self._update_display(f"You: {user_text}", "white")
         self.user_input.delete(0, tk.END)
         
-        # Schedule response generation to prevent GUI freeze
-        self.master.after(10, self._generate_and_display_response, user_text)
+        # Generate off the Tk thread to prevent GUI freeze
+        self.aio.submit(self._generate_and_display_response(user_text))
 
-    def _generate_and_display_response(self, user_text):
-        response = self.mind.generate_response(user_text)
-        self._update_display(f"Cat: {response}", "#569cd6")
+    async def _generate_and_display_response(self, user_text):
+        session = self.profiler.begin("reply")
+        try:
+            response = await self.aio.run_blocking(self.mind.generate_response, user_text)
+            self._update_display(f"Cat: {response}", "#569cd6")
+            if session:
+                await self.aio.on_ui(self.master.update_idletasks)  # the render of the reply
+        finally:
+            if session:
+                session.stop()
 
     def _update_display(self, text, color):
-        self.chat_display.configure(state=tk.NORMAL)
-        self.chat_display.insert(tk.END, text + "\n", color)
-        self.chat_display.configure(state=tk.DISABLED)
-        self.chat_display.yview(tk.END)
+        # Thread-safe: the dispatcher batches appends into one insert per frame
+        self.ui.append(self.chat_display, text + "\n", color)
 
     def start_imagination(self):
         if self.imagination_running:
@@ -106,25 +163,48 @@ class CatSeekGUI:
             (r" > ^ < ", 50, 70)
         ]
         
-        def animate(frame=0):
+        # Retained mode: create the sprite once, then only move it
+        offsets = self.BOB_OFFSETS
+        for text, x, y in frames:
+            canvas.create_text(x, y + offsets[0], text=text, fill="white", tags="cat")
+        self.frame_histogram = FrameHistogram()
+        start = last = time.perf_counter()
+        state = {"offset": offsets[0], "period": self.FRAME_MIN_S, "last": last}
+        
+        def animate():
             if not self.imagination_running:
                 return
-                
-            canvas.delete("all")
-            # Smoother animation using sine wave
-            y_offset = int(10 * (1 + (frame % 60)/30))
-            for text, x, y in frames:
-                canvas.create_text(x, y + y_offset, text=text, fill="white")
-            imagine_window.after(16, animate, frame + 1)
-        
-        animate()
+            now = time.perf_counter()
+            interval = now - state["last"]
+            state["last"] = now
+            self.frame_histogram.record(interval)
+            
+            # Position follows wall-clock time, so late frames skip ahead instead of lagging
+            step = int((now - start) / self.BOB_CYCLE_S * len(offsets)) % len(offsets)
+            dy = offsets[step] - state["offset"]
+            if dy:
+                canvas.move("cat", 0, dy)
+                state["offset"] = offsets[step]
+            
+            # Adaptive pacing: back off while the Tk thread is busy, recover when frames are on time
+            if interval > state["period"] * 1.5:
+                state["period"] = min(self.FRAME_MAX_S, state["period"] * 1.5)
+            else:
+                state["period"] = max(self.FRAME_MIN_S, state["period"] * 0.9)
+            work = time.perf_counter() - now
+            imagine_window.after(max(1, int((state["period"] - work) * 1000)), animate)
+        
+        imagine_window.after(int(self.FRAME_MIN_S * 1000), animate)
         imagine_window.protocol("WM_DELETE_WINDOW", lambda: self._stop_imagination(imagine_window))
 
     def _stop_imagination(self, window):
         self.imagination_running = False
         window.destroy()
+        if os.environ.get("CATSEEK_DEBUG_FRAMES"):
+            print(f"[Cat Vision] {self.frame_histogram.summary()}")
 
 if __name__ == "__main__":
+    metrics.install_from_env()  # CATGPT_METRICS_PORT / CATGPT_METRICS_FILE
     root = tk.Tk()
     app = CatSeekGUI(root)
     root.mainloop()
\ No newline at end of file
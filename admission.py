@@ -0,0 +1,125 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+
+import metrics
+
+# -------------------------------------------------------------
+#  Admission control for generation requests
+#  ------------------------------------------------------------
+#  • At most `slots` requests run at once; the rest wait in a
+#    bounded priority queue (interactive before batch)
+#  • Every request has a deadline; one that cannot start and finish
+#    in time (by an EWMA of service time) is rejected up front
+#  • A full queue sheds the newest lower-priority waiter before it
+#    turns away an interactive request
+#  • stats() is exported as catgpt_admission_* metrics
+# -------------------------------------------------------------
+
+INTERACTIVE, BATCH = 0, 1
+PRIORITIES = {"interactive": INTERACTIVE, "batch": BATCH}
+# stats() key -> (metric name, kind, help)
+_EXPORTED = {
+    "active": ("catgpt_admission_active", "gauge", "Requests holding a generation slot"),
+    "queued": ("catgpt_admission_queued", "gauge", "Requests waiting for a slot"),
+    "service_s": ("catgpt_admission_service_seconds", "gauge", "EWMA of request service time"),
+    "admitted": ("catgpt_admission_admitted_total", "counter", "Requests admitted"),
+    "rejected": ("catgpt_admission_rejected_total", "counter", "Requests rejected (deadline cannot be met or queue full)"),
+    "shed": ("catgpt_admission_shed_total", "counter", "Queued requests shed for higher-priority work"),
+    "expired": ("catgpt_admission_expired_total", "counter", "Queued requests whose deadline passed before a slot freed"),
+}
+
+
+class Rejected(Exception):
+    """Raised when a request is not admitted; retry_after is a hint in seconds."""
+
+    def __init__(self, reason, retry_after=1.0):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, slots=1, max_queue=32, default_deadline_s=60.0, service_estimate_s=2.0):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.default_deadline_s = default_deadline_s
+        self.service_s = service_estimate_s
+        self._active = 0
+        self._waiting = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self.admitted = self.rejected = self.shed = self.expired = 0
+        for key, (name, kind, help_text) in _EXPORTED.items():
+            metrics.collect(name, lambda key=key: self.stats()[key], help_text, kind)
+
+    # ---------- queue bookkeeping --------------------------------------
+    def _live(self):
+        return [entry for entry in self._waiting if not entry[2].done()]
+
+    @property
+    def depth(self):
+        return len(self._live())
+
+    def predicted_wait(self, priority=INTERACTIVE):
+        ahead = sum(1 for p, _, _ in self._live() if p <= priority)
+        busy = max(0, self._active - self.slots + 1)
+        return (ahead + busy) / self.slots * self.service_s
+
+    def stats(self):
+        return {"active": self._active, "queued": self.depth, "service_s": round(self.service_s, 3),
+                "admitted": self.admitted, "rejected": self.rejected, "shed": self.shed, "expired": self.expired}
+
+    # ---------- admission ----------------------------------------------
+    @contextlib.asynccontextmanager
+    async def admit(self, priority=INTERACTIVE, deadline_s=None):
+        """Hold a slot for the body of the `async with`, or raise Rejected."""
+        now = time.monotonic()
+        deadline = now + (deadline_s or self.default_deadline_s)
+        wait = self.predicted_wait(priority)
+        if now + wait + self.service_s > deadline:
+            self.rejected += 1
+            raise Rejected("would miss its deadline", retry_after=wait)
+
+        if self._active < self.slots and not self._live():
+            self._active += 1
+        else:
+            await self._enqueue(priority, deadline)
+        self.admitted += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.service_s = 0.8 * self.service_s + 0.2 * (time.monotonic() - start)
+            self._release()
+
+    async def _enqueue(self, priority, deadline):
+        live = self._live()
+        if len(live) >= self.max_queue:
+            victim = max(live, key=lambda e: (e[0], e[1]))  # lowest priority, newest
+            if victim[0] <= priority:
+                self.rejected += 1
+                raise Rejected("queue full", retry_after=self.predicted_wait(priority))
+            victim[2].set_exception(Rejected("shed for higher-priority work", retry_after=self.service_s))
+            self.shed += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._seq), future))
+        try:
+            await asyncio.wait_for(future, deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self.expired += 1
+            raise Rejected("deadline passed while queued", retry_after=self.service_s) from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()  # slot was granted just as the caller went away
+            raise
+
+    def _release(self):
+        self._active -= 1
+        while self._waiting:
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():  # skip waiters that timed out or were shed
+                self._active += 1
+                future.set_result(None)
+                return
@@ -0,0 +1,145 @@
+import mmap
+import os
+import struct
+
+# -------------------------------------------------------------
+#  Conversation archive (.catarc)
+#  ------------------------------------------------------------
+#  [magic][conversation records ...][index][footer]
+#  • record  : n_msgs u32, then per message role u8, len u32, utf-8
+#  • index   : per conversation offset u64, size u64, n_msgs u32,
+#              title_len u16, utf-8 title
+#  • footer  : index_offset u64, count u32, magic
+#  Records are written as they come, so export streams; readers mmap
+#  the file and only touch the footer, the index and the records they
+#  open, so listing a multi-GB archive costs one index read.
+# -------------------------------------------------------------
+
+MAGIC = b"CATARC1\n"
+ROLES = ("user", "assistant")
+_RECORD = struct.Struct("<I")
+_MESSAGE = struct.Struct("<BI")
+_ENTRY = struct.Struct("<QQIH")
+_FOOTER = struct.Struct("<QI8s")
+TITLE_MAX = 120
+
+
+def chat_title(conv, index, limit=32):
+    """Sidebar title shared by the frontends and the archive index."""
+    if not conv:
+        return f"Chat {index + 1}"
+    first = conv[0][1]
+    return first[:limit] + "…" if len(first) > limit else first
+
+
+class ArchiveWriter:
+    def __init__(self, path):
+        self.path = path
+        self._tmp = path + ".tmp"
+        self._f = open(self._tmp, "wb")
+        self._f.write(MAGIC)
+        self._index = []  # (offset, size, n_msgs, title bytes)
+
+    def add(self, title, messages):
+        """Append one conversation: a list of (role, text) pairs."""
+        parts = [_RECORD.pack(len(messages))]
+        for role, text in messages:
+            data = text.encode("utf-8")
+            parts.append(_MESSAGE.pack(ROLES.index(role), len(data)))
+            parts.append(data)
+        self.add_raw(title, b"".join(parts), len(messages))
+
+    def add_raw(self, title, record, n_msgs):
+        """Append an already encoded record, e.g. copied straight out of another archive."""
+        offset = self._f.tell()
+        self._f.write(record)
+        # cut on a character boundary; a split multibyte character would read back as U+FFFD
+        title = title.encode("utf-8")[:TITLE_MAX].decode("utf-8", "ignore").encode("utf-8")
+        self._index.append((offset, len(record), n_msgs, title))
+
+    def close(self):
+        if self._f.closed:
+            return
+        index_offset = self._f.tell()
+        for offset, size, n_msgs, title in self._index:
+            self._f.write(_ENTRY.pack(offset, size, n_msgs, len(title)))
+            self._f.write(title)
+        self._f.write(_FOOTER.pack(index_offset, len(self._index), MAGIC))
+        self._f.close()
+        os.replace(self._tmp, self.path)  # a crash mid-export never leaves a torn archive
+
+    def abort(self):
+        self._f.close()
+        os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ArchiveReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < len(MAGIC) + _FOOTER.size or self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a CATGPT archive")
+        index_offset, count, magic = _FOOTER.unpack_from(self._mm, len(self._mm) - _FOOTER.size)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is truncated (no archive footer)")
+        self.entries = []  # (offset, size, n_msgs, title)
+        pos = index_offset
+        for _ in range(count):
+            offset, size, n_msgs, title_len = _ENTRY.unpack_from(self._mm, pos)
+            pos += _ENTRY.size
+            title = self._mm[pos:pos + title_len].decode("utf-8", "replace")
+            pos += title_len
+            self.entries.append((offset, size, n_msgs, title))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def title(self, i):
+        return self.entries[i][3]
+
+    def conversation(self, i):
+        """Decode conversation i; only its own pages of the file are read."""
+        offset, size, _, _ = self.entries[i]
+        (n_msgs,) = _RECORD.unpack_from(self._mm, offset)
+        pos, messages = offset + _RECORD.size, []
+        for _ in range(n_msgs):
+            role, length = _MESSAGE.unpack_from(self._mm, pos)
+            pos += _MESSAGE.size
+            messages.append((ROLES[role], self._mm[pos:pos + length].decode("utf-8")))
+            pos += length
+        return messages
+
+    def raw(self, i):
+        offset, size, n_msgs, _ = self.entries[i]
+        return self._mm[offset:offset + size], n_msgs
+
+    def close(self):
+        self._mm.close()
+
+
+def export_conversations(path, items):
+    """Stream (title, conversation) pairs to *path*; returns how many were written.
+
+    A conversation is a list of (role, text) pairs, or a (reader, index) pair
+    for a chat not yet opened from another archive, which is copied as raw bytes.
+    """
+    with ArchiveWriter(path) as writer:
+        for title, conv in items:
+            if isinstance(conv, tuple):
+                reader, entry = conv
+                writer.add_raw(title, *reader.raw(entry))
+            else:
+                writer.add(title, conv)
+    return len(items)
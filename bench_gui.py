@@ -0,0 +1,149 @@
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import tkinter as tk
+
+# -------------------------------------------------------------
+#  Headless render benchmark for the Tk frontends
+#  ------------------------------------------------------------
+#  • Starts Xvfb when no DISPLAY is available
+#  • ChatGPTClone: append N bubbles, switch between conversations
+#    of size N, rebuild the chat list, scroll through N messages
+#  • CatSeekGUI: append N lines through _update_display
+#  • Prints scaling curves as JSON: {metric: [[n, seconds], ...]}
+#  Usage: python bench_gui.py --sizes 10 50 100 200 --out bench.json
+# -------------------------------------------------------------
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CODE_REPLY = "Here you go:\n```python\ndef f(x):\n    return x * 2\n```"
+
+
+def load_frontend(filename, name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_virtual_display():
+    """Launch Xvfb on a free display number if none is set; returns the process or None."""
+    if os.environ.get("DISPLAY"):
+        return None
+    if not shutil.which("Xvfb"):
+        sys.exit("No DISPLAY and Xvfb not found; install xvfb or run under xvfb-run")
+    display = ":%d" % (90 + os.getpid() % 100)
+    proc = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = display
+    time.sleep(0.5)
+    return proc
+
+
+def settle(root):
+    """Process pending events, timers and redraws until the UI is idle."""
+    root.update()
+    root.update_idletasks()
+
+
+def message(i):
+    return CODE_REPLY if i % 5 == 4 else f"Message {i}: the quick brown cat jumps over the lazy dog."
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+# ---------- ChatGPTClone ---------------------------------------------
+def bench_chatgpt_clone(sizes):
+    module = load_frontend("tunedon5.17.25acatgpt.py", "chatgpt_clone")
+    results = {"append": [], "switch": [], "refresh_chat_list": [], "scroll_step": []}
+    for n in sizes:
+        root = tk.Tk()
+        root.geometry("960x680")
+        app = module.ChatGPTClone(root)
+        settle(root)
+
+        def append():
+            for i in range(n):
+                (app._user_msg if i % 2 == 0 else app._assistant_msg)(message(i))
+            settle(root)
+        results["append"].append([n, timed(append)])
+
+        # second conversation of the same size, switched to and from
+        app.conversations.append([("user" if i % 2 == 0 else "assistant", message(i)) for i in range(n)])
+
+        def switch():
+            for idx in (len(app.conversations) - 1, 0):
+                app.current_conv_idx = idx
+                app._load_conversation()
+                settle(root)
+        results["switch"].append([n, timed(switch) / 2])
+
+        app.conversations.extend([("user", f"chat {i}")] for i in range(n))
+        results["refresh_chat_list"].append([n, timed(lambda: (app.refresh_chat_list(), settle(root)))])
+
+        steps = 20
+
+        def scroll():
+            for k in range(steps + 1):
+                app.canvas.yview_moveto(k / steps)
+                settle(root)
+        results["scroll_step"].append([n, timed(scroll) / (steps + 1)])
+        root.destroy()
+    return results
+
+
+# ---------- CatSeekGUI -----------------------------------------------
+def bench_catseek(sizes):
+    module = load_frontend("CatSEEKR1.py", "catseek")
+    results = {"update_display": []}
+    for n in sizes:
+        root = tk.Tk()
+        app = module.CatSeekGUI(root)
+        settle(root)
+
+        def append():
+            for i in range(n):
+                app._update_display(f"Cat: {message(i)}", "#569cd6")
+            while app.ui.depth:
+                settle(root)
+                time.sleep(0.001)
+            settle(root)
+        results["update_display"].append([n, timed(append)])
+        root.destroy()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless GUI render benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200, 400])
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    xvfb = start_virtual_display()
+    try:
+        report = {
+            "sizes": args.sizes,
+            "ChatGPTClone": bench_chatgpt_clone(args.sizes),
+            "CatSeekGUI": bench_catseek(args.sizes),
+        }
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,58 @@
+import asyncio
+import sys
 import tkinter as tk
-from tkinter import Frame, Canvas, Scrollbar, Entry, Button, Listbox, END, Toplevel, Text
-import contextlib
-import io
+from tkinter import Frame, Canvas, Scrollbar, Entry, Button, Listbox, END, Toplevel, Text, filedialog, messagebox
 import random
 import re
 
+import metrics
+from archive import ArchiveReader, chat_title, export_conversations
+from dispatch import UIDispatcher
+from highlight import CodeHighlighter, visible_in_canvas
+from memdiag import MemoryDiagnostics, widget_census
+from profiler import RequestProfiler
+from stallwatch import StallWatchdog
+from tkasync import TkAsyncLoop
+
+# Runs in a fresh interpreter (python -I) fed the snippet on stdin
+SANDBOX_RUNNER = '''
+import sys
+code = sys.stdin.read()
+try:
+    exec(code, {"__builtins__": {"print": print, "range": range, "len": len, "int": int, "float": float}}, {})
+except Exception as e:
+    print(f"\\nError: {e}")
+'''
+
 class O3MiniCopycat:
-    def __init__(self):
-        self.greetings = [
-            "Meow! Welcome to CATGPT 🐾 — what shall we vibe about?",
-            "Catseek R1 ready, nyah! Type anything to begin.",
-            "Hey, cutie! Ready to claw through code or just meme?"
-        ]
-        self.fallbacks = [
-            "Hmm, that's interesting! Want to go deeper?",
-            "Mrow? Try rephrasing or share more details.",
-            "Not sure I caught that, meow — one more time?"
-        ]
-        self.jokes = [
-            "Why do programmers like cats? Because they take naps on keyboards.",
-            "Cats are natural hackers — just look at the paw-ssword they typed!",
-            "What's a cat’s favorite button? FUR-mat disk."
-        ]
-        self.affirmations = [
-            "You're the purr-fect coder! Keep going.",
-            "Every bug can be tamed with enough purrs.",
-            "Remember: If you fits, you ships!"
-        ]
-        self.code_examples = [
-            "Here's a Python cat:\n```python\ndef cat():\n    print('meow!')\n```",
-            "Try this:\n```python\nprint('CATGPT purrs at your service!')\n```",
-            "Want a for-loop, nyah?\n```python\nfor i in range(3):\n    print('meow', i)\n```"
-        ]
+    # Response tables are shared by every chat; instances carry no state
+    __slots__ = ()
+
+    GREETINGS = (
+        "Meow! Welcome to CATGPT 🐾 — what shall we vibe about?",
+        "Catseek R1 ready, nyah! Type anything to begin.",
+        "Hey, cutie! Ready to claw through code or just meme?"
+    )
+    FALLBACKS = (
+        "Hmm, that's interesting! Want to go deeper?",
+        "Mrow? Try rephrasing or share more details.",
+        "Not sure I caught that, meow — one more time?"
+    )
+    JOKES = (
+        "Why do programmers like cats? Because they take naps on keyboards.",
+        "Cats are natural hackers — just look at the paw-ssword they typed!",
+        "What's a cat’s favorite button? FUR-mat disk."
+    )
+    AFFIRMATIONS = (
+        "You're the purr-fect coder! Keep going.",
+        "Every bug can be tamed with enough purrs.",
+        "Remember: If you fits, you ships!"
+    )
+    CODE_EXAMPLES = (
+        "Here's a Python cat:\n```python\ndef cat():\n    print('meow!')\n```",
+        "Try this:\n```python\nprint('CATGPT purrs at your service!')\n```",
+        "Want a for-loop, nyah?\n```python\nfor i in range(3):\n    print('meow', i)\n```"
+    )
 
     def _intent(self, prompt):
         tokens = prompt.lower().split()
@@ -50,17 +71,17 @@ class O3MiniCopycat:
     def generate(self, prompt: str) -> str:
         intent = self._intent(prompt)
         if intent == "greet":
-            return random.choice(self.greetings)
+            return random.choice(self.GREETINGS)
         elif intent == "joke":
-            return random.choice(self.jokes)
+            return random.choice(self.JOKES)
         elif intent == "affirm":
-            return random.choice(self.affirmations)
+            return random.choice(self.AFFIRMATIONS)
         elif intent == "code":
-            return random.choice(self.code_examples)
+            return random.choice(self.CODE_EXAMPLES)
         elif intent == "question":
             return "That's a good question! But I'm just a cat-bot. Got tuna?"
         else:
-            return random.choice(self.fallbacks)
+            return random.choice(self.FALLBACKS)
 
 def extract_code_blocks(text: str):
     return re.findall(r"```(?:python)?\n(.*?)```", text, re.DOTALL) or []
@@ -71,6 +92,7 @@ class CATGPT:
     MSG_BG_USER = "#343541"
     MSG_BG_ASSIST = "#40414f"
     CODE_BG = "#23252e"
+    SANDBOX_TIMEOUT_S = 5
 
     def __init__(self, root: tk.Tk):
         self.root = root
@@ -79,6 +101,12 @@ class CATGPT:
         root.configure(bg=self.SIDEBAR_BG)
         root.geometry("940x660")
         root.minsize(800, 600)
+        self.ui = UIDispatcher(root)
+        self.watchdog = StallWatchdog.install_from_env(root)  # opt-in: CATGPT_WATCHDOG=1
+        self.aio = TkAsyncLoop(self.ui)
+        self.profiler = RequestProfiler.install_from_env()  # CATGPT_PROFILE=1 or Diagnostics menu
+        self.memdiag = MemoryDiagnostics.install_from_env(root, self._memory_counters)  # CATGPT_MEMDIAG=1
+        self._build_menu()
 
         # Sidebar
         sidebar = Frame(root, bg=self.SIDEBAR_BG, width=self.SIDEBAR_WIDTH)
@@ -93,6 +121,14 @@ class CATGPT:
         )
         new_btn.pack(fill="x", pady=(14, 8), padx=10)
 
+        archive_bar = Frame(sidebar, bg=self.SIDEBAR_BG)
+        archive_bar.pack(fill="x", padx=10, pady=(0, 8))
+        for label, command in (("Import…", self.import_chats), ("Export…", self.export_chats)):
+            Button(
+                archive_bar, text=label, bg=self.SIDEBAR_BG, fg="#c5c5d2", activebackground="#55596b",
+                bd=0, font=("Segoe UI", 9), padx=6, pady=3, command=command
+            ).pack(side="left", expand=True, fill="x")
+
         self.chat_list = Listbox(
             sidebar, bg=self.SIDEBAR_BG, fg="#f0f0f0", highlightthickness=0,
             bd=0, activestyle='none', selectbackground="#55596b", font=("Segoe UI", 10)
@@ -105,8 +141,9 @@ class CATGPT:
         main.pack(side="right", fill="both", expand=True)
 
         self.canvas = Canvas(main, bg=self.MSG_BG_USER, highlightthickness=0)
+        self.highlighter = CodeHighlighter(root, is_visible=lambda w: visible_in_canvas(self.canvas, w))
         self.scrollbar = Scrollbar(main, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
         self.scrollbar.pack(side="right", fill="y")
         self.canvas.pack(side="left", fill="both", expand=True)
 
@@ -134,10 +171,35 @@ class CATGPT:
 
         self.engine = O3MiniCopycat()
         self.conversations = [[]]  # list of list[(role,text)]
+        self.archived = {}  # conv idx -> (ArchiveReader, entry) not yet read from disk
         self.current_conv_idx = 0
         self.refresh_chat_list()
         self._assistant_msg("Meow! Welcome to CATGPT 🐾 — let's code, chat, or just vibe.")
 
+    def _build_menu(self):
+        menubar = tk.Menu(self.root)
+        diagnostics = tk.Menu(menubar, tearoff=0)
+        self.profile_var = tk.BooleanVar(value=self.profiler.enabled)
+        diagnostics.add_checkbutton(label="Profile replies (flamegraph)", variable=self.profile_var,
+                                    command=lambda: setattr(self.profiler, "enabled", self.profile_var.get()))
+        diagnostics.add_command(label="Memory diagnostics…", command=self.memdiag.open_panel)
+        menubar.add_cascade(label="Diagnostics", menu=diagnostics)
+        self.root.config(menu=menubar)
+
+    def _memory_counters(self):
+        current = self.conversations[self.current_conv_idx]
+        return {
+            "conversations": len(self.conversations),
+            "messages (all chats)": sum(len(conv) for conv in self.conversations),
+            "messages (open chat)": len(current),
+            "widgets (open chat)": sum(widget_census(self.msg_frame).values()) - 1,
+            "engine history": len(getattr(self.engine, "history", ())),
+        }
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.highlighter.refresh()
+
     def _create_bubble(self, text: str, is_user: bool):
         bg = self.MSG_BG_USER if is_user else self.MSG_BG_ASSIST
         anchor = "e" if is_user else "w"
@@ -169,6 +231,7 @@ class CATGPT:
         text_widget.insert("1.0", code.rstrip())
         text_widget.config(state="disabled")
         text_widget.pack(side="left", fill="both", expand=True, padx=(6, 2), pady=4)
+        self.highlighter.register(text_widget, code.rstrip())
         Button(
             frame, text="Run", bg="#19c37d", fg="#fff", font=("Segoe UI", 9, "bold"),
             bd=0, relief="flat", padx=8, pady=1, activebackground="#15b26b",
@@ -183,15 +246,34 @@ class CATGPT:
         output_box = Text(win, bg="#181e1b", fg="#e2e8f0", font=("Consolas", 12),
                           wrap="word", height=14, width=68)
         output_box.pack(padx=14, pady=16, fill="both", expand=True)
-        f = io.StringIO()
+        output_box.insert("1.0", "[Running…]")
+        def show(output: str):
+            if not output_box.winfo_exists():
+                return  # popup closed before the run finished
+            output_box.delete("1.0", END)
+            output_box.insert("1.0", output if output.strip() else "[No output]")
+            output_box.config(state="disabled")
+
+        def failed(exc):
+            show(f"[Timed out after {self.SANDBOX_TIMEOUT_S}s]" if isinstance(exc, TimeoutError) else f"Error: {exc}")
+
+        self.aio.submit(self._exec_sandboxed(code), timeout=self.SANDBOX_TIMEOUT_S, on_done=show, on_error=failed)
+
+    @staticmethod
+    async def _exec_sandboxed(code: str) -> str:
+        # a child process, not a pool thread: a runaway snippet is killed on timeout
+        # instead of holding a worker that chat replies need
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-I", "-c", SANDBOX_RUNNER,
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
         try:
-            with contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
-                exec(code, {"__builtins__": {"print": print, "range": range, "len": len, "int": int, "float": float}}, {})
-        except Exception as e:
-            f.write(f"\nError: {e}\n")
-        output = f.getvalue()
-        output_box.insert("1.0", output if output.strip() else "[No output]")
-        output_box.config(state="disabled")
+            output, _ = await proc.communicate(code.encode())
+        finally:
+            if proc.returncode is None:
+                proc.kill()  # timed out (the submit() timeout cancelled us)
+                await proc.wait()  # reap it and close its pipes now, not at interpreter exit
+        return output.decode(errors="replace")
 
     def send(self):
         txt = self.entry.get().strip()
@@ -199,15 +281,29 @@ class CATGPT:
             return
         self.entry.delete(0, END)
         self._user_msg(txt)
-        self.root.after(200, lambda: self._assistant_msg(self.engine.generate(txt)))
+        self.aio.submit(self._generate_reply(self.engine, txt, self.current_conv_idx))
+
+    async def _generate_reply(self, engine, txt: str, conv_idx: int):
+        session = self.profiler.begin(f"chat{conv_idx}")
+        try:
+            reply = await self.aio.run_blocking(engine.generate, txt)
+            await self.aio.on_ui(self._assistant_msg, reply, conv_idx)
+            if session:
+                await self.aio.on_ui(self.root.update_idletasks)  # include layout of the new bubble
+        finally:
+            if session:
+                session.stop()
 
     def _user_msg(self, text: str):
         self.conversations[self.current_conv_idx].append(("user", text))
         self._create_bubble(text, is_user=True)
 
-    def _assistant_msg(self, text: str):
-        self.conversations[self.current_conv_idx].append(("assistant", text))
-        self._create_bubble(text, is_user=False)
+    def _assistant_msg(self, text: str, conv_idx=None):
+        if conv_idx is None:
+            conv_idx = self.current_conv_idx
+        self.conversations[conv_idx].append(("assistant", text))
+        if conv_idx == self.current_conv_idx:  # user may have switched chats meanwhile
+            self._create_bubble(text, is_user=False)
 
     def new_chat(self):
         self.current_conv_idx = len(self.conversations)
@@ -220,14 +316,16 @@ class CATGPT:
 
     def refresh_chat_list(self):
         self.chat_list.delete(0, END)
-        for i, conv in enumerate(self.conversations):
-            if conv:
-                title = conv[0][1][:32] + "…" if len(conv[0][1]) > 32 else conv[0][1]
-            else:
-                title = f"Chat {i + 1}"
-            self.chat_list.insert(END, title)
+        for i in range(len(self.conversations)):
+            self.chat_list.insert(END, self._chat_title(i))
         self.chat_list.select_set(self.current_conv_idx)
 
+    def _chat_title(self, i):
+        if i in self.archived:
+            reader, entry = self.archived[i]
+            return reader.title(entry)
+        return chat_title(self.conversations[i], i)
+
     def on_chat_select(self, event):
         if not self.chat_list.curselection():
             return
@@ -240,13 +338,43 @@ class CATGPT:
     def _load_conversation(self):
         for w in self.msg_frame.winfo_children():
             w.destroy()
+        if self.current_conv_idx in self.archived:
+            # first open of an imported chat: decode just this record from the mmap
+            reader, entry = self.archived.pop(self.current_conv_idx)
+            self.conversations[self.current_conv_idx] = reader.conversation(entry)
         conv = self.conversations[self.current_conv_idx]
         for role, txt in conv:
             self._create_bubble(txt, is_user=(role == "user"))
         self.canvas.after_idle(lambda: self.canvas.yview_moveto(1.0))
         self.refresh_chat_list()
 
+    def export_chats(self):
+        path = filedialog.asksaveasfilename(
+            parent=self.root, defaultextension=".catarc", filetypes=[("CATGPT archive", "*.catarc")]
+        )
+        if not path:
+            return
+        # snapshot on the Tk thread; unopened imported chats are copied as raw bytes
+        items = [(self._chat_title(i), self.archived.get(i) or list(conv)) for i, conv in enumerate(self.conversations)]
+        self.aio.submit(self.aio.run_blocking(export_conversations, path, items),
+                        on_error=lambda exc: messagebox.showerror("Export failed", str(exc), parent=self.root))
+
+    def import_chats(self):
+        path = filedialog.askopenfilename(parent=self.root, filetypes=[("CATGPT archive", "*.catarc")])
+        if not path:
+            return
+        self.aio.submit(self.aio.run_blocking(ArchiveReader, path), on_done=self._add_archive,
+                        on_error=lambda exc: messagebox.showerror("Import failed", str(exc), parent=self.root))
+
+    def _add_archive(self, reader):
+        # only the index is read here; each chat is decoded when first opened
+        for entry in range(len(reader)):
+            self.archived[len(self.conversations)] = (reader, entry)
+            self.conversations.append([])
+        self.refresh_chat_list()
+
 if __name__ == "__main__":
+    metrics.install_from_env()  # CATGPT_METRICS_PORT / CATGPT_METRICS_FILE
     tk.Tk.report_callback_exception = lambda *args: None  # suppress noisy tracebacks
     root = tk.Tk()
     CATGPT(root)
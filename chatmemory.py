@@ -0,0 +1,63 @@
+import threading
+
+# -------------------------------------------------------------
+#  Conversation memory with background compaction
+#  ------------------------------------------------------------
+#  • The prompt carries a summary of older turns plus the last few
+#    raw turns, so the prefill stays bounded however long the chat
+#  • compact() folds turns that have scrolled out of the raw window
+#    into the summary with a caller-supplied summarize(summary, turns)
+#    function; the frontends run it while the user is idle
+#  • Turns added during a compaction are kept; a cancelled or failed
+#    compaction changes nothing
+# -------------------------------------------------------------
+
+
+class ConversationMemory:
+    def __init__(self, keep_turns=4, max_raw_turns=8, max_summary_chars=1500):
+        self.keep_turns = keep_turns  # raw turns left alone by compaction
+        self.max_raw_turns = max_raw_turns  # hard cap on raw turns in the prompt
+        self.max_summary_chars = max_summary_chars
+        self.summary = ""
+        self.turns = []  # (user, assistant) not yet folded into the summary
+        self.compactions = 0
+        self._lock = threading.Lock()
+
+    def add_turn(self, user, assistant):
+        with self._lock:
+            self.turns.append((user, assistant))
+
+    def context(self):
+        """(summary, recent turns) to put in front of the next prompt."""
+        with self._lock:
+            return self.summary, list(self.turns[-self.max_raw_turns:])
+
+    @property
+    def needs_compaction(self):
+        return len(self.turns) > self.keep_turns
+
+    def compact(self, summarize):
+        """Fold the older turns into the summary; returns True if it did."""
+        with self._lock:
+            old = self.turns[:len(self.turns) - self.keep_turns]
+            summary = self.summary
+        if not old:
+            return False
+        new_summary = summarize(summary, old)
+        if not new_summary:
+            return False
+        with self._lock:
+            # compaction trims the front, pop_last() the back; keep_turns >= 1 keeps them apart
+            del self.turns[:len(old)]
+            self.summary = new_summary.strip()[:self.max_summary_chars]
+            self.compactions += 1
+        return True
+
+    def pop_last(self):
+        """Remove and return the newest turn (e.g. to regenerate its reply), or None."""
+        with self._lock:
+            return self.turns.pop() if self.turns else None
+
+    def clear(self):
+        with self._lock:
+            self.summary, self.turns = "", []
@@ -1,20 +1,114 @@
+import asyncio
+import time
 import tkinter as tk
 from tkinter import scrolledtext
-import threading
-import time
 import os
+import queue
 import subprocess
-import random
+import hashlib
+import json
+import shutil
+import threading
 from huggingface_hub import snapshot_download
+import transformers
 from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
 import torch
 
+import metrics
+from admission import BATCH, INTERACTIVE, AdmissionController, Rejected
+from budget import BudgetPolicy
+from chatmemory import ConversationMemory
+from dispatch import UIDispatcher
+from postprocess import AhaTriggerStage, CleanupStage, StopSequenceStage, StreamPostprocessor, TelemetryStage
+from profiler import RequestProfiler
+from scrollback import Scrollback
+from semantic_cache import SemanticCache, refers_back
+from stallwatch import StallWatchdog
+from tkasync import TkAsyncLoop
+
+class _TimedStreamer(TextIteratorStreamer):
+    """Text streamer that also times the prefill/decode boundary and detokenization"""
+    def __init__(self, tokenizer, **kwargs):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True, **kwargs)
+        self.first_token_at = None
+        self.new_tokens = 0
+        self.detokenize_s = 0.0
+        self._seen_prompt = False
+
+    def put(self, value):
+        if not self._seen_prompt:
+            self._seen_prompt = True  # generate() first hands over the prompt ids
+        else:
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.new_tokens += value.numel()
+        start = time.perf_counter()
+        super().put(value)
+        self.detokenize_s += time.perf_counter() - start
+
+class _StopOnSequences(StoppingCriteria):
+    """Stops generate() once a stop string shows up in the newly decoded tail"""
+    def __init__(self, tokenizer, stops, prompt_len):
+        self.tokenizer = tokenizer
+        self.stops = tuple(stops)
+        self.prompt_len = prompt_len
+        # only the last few tokens can complete a stop string; never re-decode the whole reply
+        self.window = max(len(tokenizer.encode(s, add_special_tokens=False)) for s in self.stops) + 2
+
+    def __call__(self, input_ids, scores, **kwargs):
+        start = max(self.prompt_len, input_ids.shape[-1] - self.window)
+        hits = []
+        for tail in self.tokenizer.batch_decode(input_ids[:, start:], skip_special_tokens=True):
+            if start == self.prompt_len:
+                tail = tail.lstrip()  # leading blank lines of the reply are not a stop
+            hits.append(any(s in tail for s in self.stops))
+        # per row, so each candidate of a batched generate() stops on its own
+        return torch.tensor(hits, dtype=torch.bool, device=input_ids.device)
+
+class _StopOnEvent(StoppingCriteria):
+    """Stops generate() at the next token once the consumer has walked away"""
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+def _repeat_cache(cache, n):
+    """Repeat a batch-1 KV cache n times along the batch dimension"""
+    if hasattr(cache, "batch_repeat_interleave"):  # DynamicCache
+        cache.batch_repeat_interleave(n)
+        return cache
+    return tuple(tuple(t.repeat_interleave(n, dim=0) for t in layer) for layer in cache)
+
 class DeepSeek7BEngine:
+    # Bump when the on-disk layout of the quantized cache changes
+    QUANT_CACHE_VERSION = 1
+    # Longest wait for the next decoded piece (covers prefill) before giving up
+    STREAM_TIMEOUT_S = 120.0
+
     def __init__(self):
         self.initialized = False
         self.model = None
         self.tokenizer = None
         self.model_path = "./deepseek-7b"
+        self.quant_cache_path = "./deepseek-7b-nf4"
+        # The base model tends to invent the next turn of the Human/Assistant template
+        self.stop_sequences = ["\nHuman:", "\nAssistant:"]
+        self.budget_policy = BudgetPolicy()
+        # Opt-in torch.compile of the forward pass; inductor artifacts persist across starts
+        self.compile_enabled = os.environ.get("CATGPT_COMPILE", "") not in ("", "0")
+        self.compile_cache_path = "./deepseek-7b-compiled"
+        # Opt-in: paraphrased repeats are answered from the cache instead of a full 7B generation
+        self.response_cache = None
+        if os.environ.get("CATGPT_SEMANTIC_CACHE", "0") != "0":
+            self.response_cache = SemanticCache(
+                threshold=float(os.environ.get("CATGPT_SEMANTIC_CACHE_THRESHOLD", "0.95")),
+                capacity=int(os.environ.get("CATGPT_SEMANTIC_CACHE_SIZE", "1024"))
+            )
+        # Conversation memory is opt-in: the GUI owns one chat, the server serves many
+        self.memory = None
+        self.summary_max_new_tokens = 160
         self.quant_config = BitsAndBytesConfig(
             load_in_4bit=True,
             bnb_4bit_quant_type="nf4",
@@ -31,54 +125,314 @@ class DeepSeek7BEngine:
             )
 
     def initialize_model(self):
-        """Load DeepSeek 7B with 4-bit quantization"""
+        """Load DeepSeek 7B with 4-bit quantization, preferring the pre-quantized cache"""
         self._download_model()
         
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.model_path,
+        with metrics.stage("model_load"):
+            self.model = self._load_quant_cache()
+            if self.model is None:
+                self.model = AutoModelForCausalLM.from_pretrained(
+                    self.model_path,
+                    device_map="auto",
+                    quantization_config=self.quant_config,
+                    trust_remote_code=True
+                )
+                try:
+                    self._write_quant_cache()
+                except Exception as e:  # cache is an optimization; never fail startup on it
+                    print(f"[DeepSeek] Could not write quantized cache: {e}")
+        self.initialized = True
+
+    def compile_model(self):
+        """Swap in a torch.compile'd forward; compiled kernels are cached on disk"""
+        os.makedirs(self.compile_cache_path, exist_ok=True)
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.abspath(self.compile_cache_path))
+        os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+        self._eager_forward = self.model.forward
+        # dynamic shapes: one graph serves every prompt length and the 1-token decode steps
+        self.model.forward = torch.compile(self.model.forward, dynamic=True)
+
+    def warmup(self):
+        """Run tiny generations so kernel selection, allocation and compilation happen now"""
+        if self.compile_enabled and not hasattr(self, "_eager_forward"):
+            self.compile_model()
+        try:
+            with metrics.stage("warmup"), torch.inference_mode():
+                for prompt in ("Human: hi\nAssistant:", "Human: warm up the decode path, please\nAssistant:"):
+                    ids = self.tokenizer(prompt, return_tensors="pt").input_ids.to(self.model.device)
+                    self.model.generate(ids, max_new_tokens=4, do_sample=False,
+                                        pad_token_id=self.tokenizer.eos_token_id)
+        except Exception as e:
+            if not hasattr(self, "_eager_forward"):
+                raise
+            # quantized layers the compiler cannot handle: fall back to eager, warmed up
+            print(f"[DeepSeek] Compiled path failed ({e}); using eager execution")
+            self.model.forward = self._eager_forward
+            del self._eager_forward
+            self.compile_enabled = False
+            self.warmup()
+
+    def _cache_manifest(self):
+        """Identity of the cache contents: format version, source checkpoint and quant settings"""
+        h = hashlib.sha256()
+        for name in sorted(os.listdir(self.model_path)):
+            path = os.path.join(self.model_path, name)
+            if os.path.isfile(path):
+                st = os.stat(path)
+                h.update(f"{name}:{st.st_size}:{int(st.st_mtime)}\n".encode())
+        config_path = os.path.join(self.model_path, "config.json")
+        if os.path.exists(config_path):
+            with open(config_path, "rb") as f:
+                h.update(f.read())
+        h.update(json.dumps(self.quant_config.to_dict(), sort_keys=True, default=str).encode())
+        return {
+            "version": self.QUANT_CACHE_VERSION,
+            "source": h.hexdigest(),
+            "transformers": transformers.__version__,
+        }
+
+    def _load_quant_cache(self):
+        """Memory-map the already-quantized safetensors cache, or None if missing/stale"""
+        manifest_path = os.path.join(self.quant_cache_path, "catgpt_cache.json")
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest != self._cache_manifest():
+            print("[DeepSeek] Quantized cache is stale, rebuilding from checkpoint")
+            return None
+        # quantization_config is stored in the cache's config.json; no re-quantization happens
+        return AutoModelForCausalLM.from_pretrained(
+            self.quant_cache_path,
             device_map="auto",
-            quantization_config=self.quant_config,
-            trust_remote_code=True
+            trust_remote_code=True,
+            use_safetensors=True
         )
-        self.initialized = True
+
+    def _write_quant_cache(self):
+        tmp_path = self.quant_cache_path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        self.model.save_pretrained(tmp_path, safe_serialization=True)
+        with open(os.path.join(tmp_path, "catgpt_cache.json"), "w") as f:
+            json.dump(self._cache_manifest(), f, indent=2)
+        # swap in only a complete cache so a crash mid-write never leaves a half cache behind
+        shutil.rmtree(self.quant_cache_path, ignore_errors=True)
+        os.replace(tmp_path, self.quant_cache_path)
 
     def generate_response(self, input_text):
         """Generate response using DeepSeek 7B with R1 patterns"""
-        prompt = self._create_r1_prompt(input_text)
-        inputs = self.tokenizer(prompt, return_tensors="pt").to("cuda")
+        return "".join(self.generate_stream(input_text))
+
+    def generate_stream(self, input_text):
+        """Yield the postprocessed response piece by piece as tokens are decoded"""
+        # a cached answer knows nothing about earlier turns: mid-chat, only self-contained prompts use it
+        if self.response_cache is not None and not (self._has_context() and refers_back(input_text)):
+            with metrics.stage("cache_lookup"):
+                cached, _ = self.response_cache.lookup(input_text)
+            metrics.inc("catgpt_semantic_cache_total", 1, "Semantic cache lookups",
+                        result="hit" if cached is not None else "miss")
+            if cached is not None:
+                if self.memory is not None:
+                    self.memory.add_turn(input_text, cached)
+                yield self._postprocess_response(cached)  # fresh footer, not the one from when it was cached
+                return
+            stream = self._generate_stream(input_text)
+            try:
+                while True:
+                    try:
+                        piece = next(stream)
+                    except StopIteration as done:
+                        reply = done.value
+                        break
+                    yield piece
+            finally:
+                stream.close()  # a cancelled consumer must stop the decode, not leave it running
+            self.response_cache.store(input_text, reply)
+        else:
+            yield from self._generate_stream(input_text)
+
+    def _generate_stream(self, input_text):
+        """Yield the pieces to show; returns the bare reply (StopIteration.value)"""
+        with metrics.stage("prompt_build"):
+            prompt = self._create_r1_prompt(input_text)
+        with metrics.stage("tokenize"):
+            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        # "hi" does not get the same decode budget as a coding question
+        budget = self.budget_policy.plan(input_text, self.stop_sequences)
+        metrics.inc("catgpt_budget_requests_total", 1, "Requests per budget class", intent=budget.intent)
         
-        outputs = self.model.generate(
-            inputs.input_ids,
-            max_new_tokens=256,
+        streamer = _TimedStreamer(self.tokenizer, timeout=self.STREAM_TIMEOUT_S)
+        cancelled = threading.Event()
+        failure = []
+
+        def run(**kwargs):
+            try:
+                self.model.generate(**kwargs)
+            except BaseException as exc:
+                failure.append(exc)
+            finally:
+                streamer.end()  # unblock the consumer even when generate() raised
+
+        generation = threading.Thread(target=run, daemon=True, kwargs=dict(
+            input_ids=inputs.input_ids,
+            max_new_tokens=budget.max_new_tokens,
             do_sample=True,
-            temperature=0.7,
+            temperature=budget.temperature,
             top_p=0.9,
             repetition_penalty=1.1,
-            pad_token_id=self.tokenizer.eos_token_id
-        )
+            pad_token_id=self.tokenizer.eos_token_id,
+            stopping_criteria=StoppingCriteriaList([
+                _StopOnSequences(self.tokenizer, budget.stop_sequences, inputs.input_ids.shape[-1]),
+                _StopOnEvent(cancelled)
+            ]),
+            streamer=streamer
+        ))
+        start = time.perf_counter()
+        generation.start()
+        
+        post = self._postprocessor(budget.stop_sequences)
+        post_s = 0.0
+        raw = []
+        try:
+            for piece in streamer:
+                raw.append(piece)
+                t = time.perf_counter()
+                out = post.feed(piece)
+                post_s += time.perf_counter() - t
+                if out:
+                    yield out
+        except GeneratorExit:
+            # closed early (e.g. the router picked another replica): free the model promptly
+            cancelled.set()
+            generation.join()
+            raise
+        except queue.Empty:
+            cancelled.set()  # a wedged generate() may never see this; the thread is a daemon
+            raise TimeoutError(f"no output from the model for {self.STREAM_TIMEOUT_S:.0f}s") from None
+        generation.join()
+        if failure:
+            raise failure[0]
+        end = time.perf_counter()
         
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return self._postprocess_response(response)
+        first = streamer.first_token_at or end
+        metrics.observe("catgpt_stage_seconds", first - start, stage="prefill")
+        metrics.observe("catgpt_stage_seconds", end - first - streamer.detokenize_s, stage="decode")
+        metrics.observe("catgpt_stage_seconds", streamer.detokenize_s, stage="detokenize")
+        metrics.inc("catgpt_prompt_tokens_total", inputs.input_ids.shape[-1], "Prompt tokens prefilled")
+        metrics.inc("catgpt_generated_tokens_total", streamer.new_tokens, "Tokens decoded")
+        metrics.inc("catgpt_requests_total", 1, "Generation requests", engine="deepseek-7b")
+        self.budget_policy.observe(first - start, end - first, streamer.new_tokens)
+        
+        t = time.perf_counter()
+        tail = post.finish()
+        metrics.observe("catgpt_stage_seconds", post_s + time.perf_counter() - t, stage="postprocess")
+        # the bare reply (no aha line / telemetry footer) is what later prompts and summaries see
+        reply = StreamPostprocessor([StopSequenceStage(budget.stop_sequences), CleanupStage()]).run("".join(raw))
+        if self.memory is not None:
+            self.memory.add_turn(input_text, reply)
+        if tail:
+            yield tail
+        return reply
+
+    def generate_candidates(self, input_text, n=3):
+        """Sample n alternative replies that share a single prefill of the prompt.
+
+        Returns [(text to show, bare reply), ...]
+        """
+        prompt = self._create_r1_prompt(input_text)
+        input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids.to(self.model.device)
+        budget = self.budget_policy.plan(input_text, self.stop_sequences)
+        prompt_len = input_ids.shape[-1]
+        with torch.inference_mode():
+            # encode the prompt once (all but its last token, which generate() feeds itself),
+            # then copy the KV cache to every candidate row instead of prefilling n times
+            with metrics.stage("prefill"):
+                cache = self.model(input_ids=input_ids[:, :-1], use_cache=True).past_key_values
+                cache = _repeat_cache(cache, n)
+            with metrics.stage("decode"):
+                output = self.model.generate(
+                    input_ids=input_ids.repeat(n, 1),
+                    past_key_values=cache,
+                    max_new_tokens=budget.max_new_tokens,
+                    do_sample=True,
+                    temperature=max(budget.temperature, 0.7),  # low-temperature intents would repeat themselves
+                    top_p=0.9,
+                    repetition_penalty=1.1,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    stopping_criteria=StoppingCriteriaList([
+                        _StopOnSequences(self.tokenizer, budget.stop_sequences, prompt_len)
+                    ])
+                )
+        metrics.inc("catgpt_prompt_tokens_total", prompt_len, "Prompt tokens prefilled")
+        metrics.inc("catgpt_generated_tokens_total", int((output[:, prompt_len:] != self.tokenizer.eos_token_id).sum()),
+                    "Tokens decoded")
+        metrics.inc("catgpt_requests_total", 1, "Generation requests", engine="deepseek-7b")
+        candidates = []
+        for text in self.tokenizer.batch_decode(output[:, prompt_len:], skip_special_tokens=True):
+            reply = StreamPostprocessor([StopSequenceStage(budget.stop_sequences), CleanupStage()]).run(text)
+            candidates.append((self._postprocessor(budget.stop_sequences).run(text), reply))
+        return candidates
+
+    def _has_context(self):
+        return self.memory is not None and any(self.memory.context())
 
     def _create_r1_prompt(self, input_text):
         """Create R1-style prompt with zero pattern formatting"""
-        return f'''Human: {input_text}\nAssistant:'''
+        if self.memory is None:
+            return f'''Human: {input_text}\nAssistant:'''
+        # summary of older turns + a bounded window of recent ones instead of the whole chat
+        summary, turns = self.memory.context()
+        parts = [f"(Earlier in this conversation: {summary})\n"] if summary else []
+        parts += [f"Human: {user}\nAssistant: {reply}\n" for user, reply in turns]
+        parts.append(f"Human: {input_text}\nAssistant:")
+        return "".join(parts)
+
+    def summarize_turns(self, summary, turns, cancel=None):
+        """Fold turns into the running summary with a short greedy generation"""
+        transcript = "".join(f"Human: {user}\nAssistant: {reply}\n" for user, reply in turns)
+        prompt = (
+            "Summarize the conversation below in a few sentences. Keep names, facts, decisions "
+            "and open questions.\n\n"
+            + (f"Summary so far: {summary}\n\n" if summary else "")
+            + f"{transcript}\nSummary:"
+        )
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        cancel = cancel or threading.Event()
+        with metrics.stage("summarize"), torch.inference_mode():
+            output = self.model.generate(
+                input_ids=inputs.input_ids,
+                max_new_tokens=self.summary_max_new_tokens,
+                do_sample=False,
+                pad_token_id=self.tokenizer.eos_token_id,
+                stopping_criteria=StoppingCriteriaList([
+                    _StopOnSequences(self.tokenizer, self.stop_sequences, inputs.input_ids.shape[-1]),
+                    _StopOnEvent(cancel)
+                ])
+            )
+        if cancel.is_set():
+            return None  # the user came back; keep the raw turns
+        text = self.tokenizer.decode(output[0, inputs.input_ids.shape[-1]:], skip_special_tokens=True)
+        return StreamPostprocessor([StopSequenceStage(self.stop_sequences), CleanupStage()]).run(text)
+
+    def compact_memory(self, cancel=None):
+        """Summarize turns that left the raw window; meant for idle time on the engine's worker"""
+        if self.memory is None or not self.memory.needs_compaction:
+            return False
+        return self.memory.compact(lambda summary, turns: self.summarize_turns(summary, turns, cancel))
+
+    def _postprocessor(self, stop_sequences=None):
+        """Aha Moment patterns, cleanup and telemetry as incremental stages"""
+        return StreamPostprocessor([
+            StopSequenceStage(stop_sequences or self.stop_sequences),
+            CleanupStage(),
+            AhaTriggerStage(),
+            TelemetryStage(self._get_vram_usage)
+        ])
 
     def _postprocess_response(self, response):
-        """Add Aha Moment patterns and cleanup"""
-        aha_triggers = [
-            ("insight", "✨ Aha Moment: Neural Pathways Activated"),
-            ("realize", "🔍 Pattern Recognized: Cognitive Leap Detected"),
-            ("understand", "🎯 Knowledge Integration: Concept Mastered")
-        ]
-        
-        if any(trigger in response.lower() for trigger, _ in aha_triggers):
-            aha_msg = random.choice(aha_triggers)[1]
-            response += f"\n[NPU SYSTEM]: {aha_msg}"
-            
-        response += f"\n[Telemetry: VRAM Usage: {self._get_vram_usage()} | Tokens: {len(response.split())}]"
-        return response
+        """Add Aha Moment patterns and cleanup to a complete response"""
+        return self._postprocessor().run(response)
 
     def _get_vram_usage(self):
         try:
@@ -94,20 +448,22 @@ class CatMind:
     def __init__(self, gui):
         self.gui = gui
         self.engine = DeepSeek7BEngine()
+        self.engine.memory = ConversationMemory()
         self.initialized = False
-        self.init_thread = threading.Thread(target=self._initialize_async)
-        self.init_thread.start()
+        self.init_future = gui.aio.submit(self._initialize_async())
 
-    def _initialize_async(self):
+    async def _initialize_async(self):
         self.gui.add_system_message("Initializing DeepSeek-R1 NeuroMatrix...")
-        time.sleep(1)
+        await asyncio.sleep(1)
         if not os.path.exists(self.engine.model_path):
             self.gui.add_system_message("Downloading cognitive patterns... (This may take several minutes)")
         else:
             self.gui.add_system_message("Loading local neural weights...")
         
         try:
-            self.engine.initialize_model()
+            await self.gui.aio.run_blocking(self.engine.initialize_model)
+            self.gui.add_system_message("Warming up inference kernels...")
+            await self.gui.aio.run_blocking(self.engine.warmup)
             self.initialized = True
             self.gui.add_system_message("System ready! Start chatting with CatGPT!")
             self.gui.enable_input()
@@ -115,11 +471,30 @@ class CatMind:
             self.gui.add_system_message(f"Initialization failed: {str(e)}")
 
 class CatGPTGUI:
+    # Quiet time before older turns are summarized on the model worker
+    IDLE_SUMMARY_MS = 8000
+    # Alternatives sampled by one Regenerate click (one prefill, batched decode)
+    REGENERATE_N = max(1, int(os.environ.get("CATGPT_REGENERATE_N", "3")))
+
     def __init__(self, master):
         self.master = master
         master.title("CatGPT 1.0")
         master.geometry("600x400")
         master.configure(bg="#1a1a1a")
+        self.ui = UIDispatcher(master)
+        self.watchdog = StallWatchdog.install_from_env(master)  # opt-in: CATGPT_WATCHDOG=1
+        # One loaded model: a single blocking worker serializes generate() calls
+        self.aio = TkAsyncLoop(self.ui, max_blocking=1)
+        self.admission = AdmissionController(slots=1, max_queue=4, default_deadline_s=120.0, service_estimate_s=10.0)
+        self.profiler = RequestProfiler.install_from_env()  # CATGPT_PROFILE=1 or Diagnostics menu
+
+        menubar = tk.Menu(master)
+        diagnostics = tk.Menu(menubar, tearoff=0)
+        self.profile_var = tk.BooleanVar(value=self.profiler.enabled)
+        diagnostics.add_checkbutton(label="Profile replies (flamegraph)", variable=self.profile_var,
+                                    command=lambda: setattr(self.profiler, "enabled", self.profile_var.get()))
+        menubar.add_cascade(label="Diagnostics", menu=diagnostics)
+        master.config(menu=menubar)
 
         # Chat history display
         self.chat_history = scrolledtext.ScrolledText(
@@ -132,6 +507,7 @@ class CatGPTGUI:
         )
         self.chat_history.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
         self.chat_history.configure(state=tk.DISABLED)
+        self.scrollback = Scrollback(self.chat_history)
 
         # Input frame
         input_frame = tk.Frame(master, bg="#1a1a1a")
@@ -148,6 +524,12 @@ class CatGPTGUI:
         )
         self.user_input.pack(side=tk.LEFT, fill=tk.X, expand=True)
         self.user_input.bind("<Return>", lambda event: self.send_message())
+        self.user_input.bind("<Key>", lambda event: self._user_active(), add="+")
+        self._idle_job = None
+        self._summary_cancel = threading.Event()
+        self.last_user_text = None
+        self.reply_in_memory = False  # whether memory's newest turn is the reply to last_user_text
+        self.candidates, self.candidate_idx, self.flip_bar = [], 0, None
 
         # Send button
         self.send_button = tk.Button(
@@ -161,54 +543,195 @@ class CatGPTGUI:
         )
         self.send_button.pack(side=tk.RIGHT, padx=(5,0))
 
+        # Regenerate button: samples alternatives for the last reply
+        self.regen_button = tk.Button(
+            input_frame,
+            text="↻",
+            command=self.regenerate,
+            bg="#3d3d3d",
+            fg="white",
+            activebackground="#555555",
+            state=tk.DISABLED
+        )
+        self.regen_button.pack(side=tk.RIGHT, padx=(5,0))
+
         # Initialize AI system
         self.cat_mind = CatMind(self)
 
+    # Safe to call from worker threads: all widget access goes through self.ui
     def add_system_message(self, message):
-        self.chat_history.configure(state=tk.NORMAL)
-        self.chat_history.insert(tk.END, f"\n[System] {message}\n", "system")
-        self.chat_history.configure(state=tk.DISABLED)
-        self.chat_history.see(tk.END)
+        self.ui.append(self.chat_history, f"\n[System] {message}\n", "system")
 
     def enable_input(self):
-        self.user_input.configure(state=tk.NORMAL)
-        self.send_button.configure(state=tk.NORMAL)
+        self.ui.post(self._set_input_state, tk.NORMAL)
+
+    def _set_input_state(self, state):
+        self.user_input.configure(state=state)
+        self.send_button.configure(state=state)
+        self.regen_button.configure(state=state if self.last_user_text else tk.DISABLED)
 
     def send_message(self):
         user_text = self.user_input.get()
         if not user_text.strip():
             return
 
-        # Display user message
-        self.chat_history.configure(state=tk.NORMAL)
-        self.chat_history.insert(tk.END, f"\n[You] {user_text}\n", "user")
-        self.chat_history.configure(state=tk.DISABLED)
+        self._user_active()
+        self._retire_candidates()
+        self.last_user_text = user_text
+        self.reply_in_memory = False
+
+        # Display user message (queued behind any pending worker output)
+        self.ui.append(self.chat_history, f"\n[You] {user_text}\n", "user")
         self.user_input.delete(0, tk.END)
 
         # Disable input during processing
-        self.user_input.configure(state=tk.DISABLED)
-        self.send_button.configure(state=tk.DISABLED)
+        self._set_input_state(tk.DISABLED)
 
-        # Process response in thread
-        threading.Thread(target=self.generate_response, args=(user_text,)).start()
+        # Process response on the asyncio loop
+        self.aio.submit(self.generate_response(user_text))
 
-    def generate_response(self, user_text):
+    async def generate_response(self, user_text):
+        session = self.profiler.begin("reply")
         try:
-            response = self.cat_mind.engine.generate_response(user_text)
-            self.display_response(response)
+            async with self.admission.admit(INTERACTIVE):
+                pieces = self.cat_mind.engine.generate_stream(user_text)
+                done = object()
+                self.ui.append(self.chat_history, "\n[CatGPT] ", "assistant")
+                # the dispatcher merges pieces that arrive within a frame into one insert
+                while (piece := await self.aio.run_blocking(next, pieces, done)) is not done:
+                    self.ui.append(self.chat_history, piece, "assistant", "reply")
+                self.ui.append(self.chat_history, "\n", "assistant")
+                self.reply_in_memory = True  # the exhausted stream has recorded its turn
+                if session:
+                    # queued behind the last append, so the final render is in the profile
+                    await self.aio.on_ui(self.master.update_idletasks)
+        except Rejected as e:
+            self.add_system_message(f"CatGPT is busy ({e}); try again in ~{e.retry_after:.0f}s")
         except Exception as e:
             self.add_system_message(f"Error generating response: {str(e)}")
         finally:
-            self.user_input.configure(state=tk.NORMAL)
-            self.send_button.configure(state=tk.NORMAL)
+            if session:
+                session.stop()
+            self.enable_input()
+            if self.cat_mind.engine.memory.needs_compaction:
+                self.ui.post(self._schedule_compaction)
+
+    # ---------- regenerate: N candidates, flipped through in place -----
+    def regenerate(self):
+        if self.last_user_text is None:
+            return
+        self._user_active()
+        self._retire_candidates(keep_reply=True)
+        self._set_input_state(tk.DISABLED)
+        self.aio.submit(self._regenerate(self.last_user_text))
+
+    async def _regenerate(self, user_text):
+        engine = self.cat_mind.engine
+        # the reply being replaced must not be in its own prompt; a failed reply left no turn to pop
+        previous = engine.memory.pop_last() if self.reply_in_memory else None
+        self.reply_in_memory = False
+        try:
+            async with self.admission.admit(INTERACTIVE):
+                candidates = await self.aio.run_blocking(engine.generate_candidates, user_text, self.REGENERATE_N)
+            engine.memory.add_turn(user_text, candidates[0][1])
+            self.reply_in_memory = True
+            self.ui.post(self._show_candidates, candidates)
+        except Exception as e:
+            if previous:
+                engine.memory.add_turn(*previous)
+                self.reply_in_memory = True
+            if isinstance(e, Rejected):
+                self.add_system_message(f"CatGPT is busy ({e}); try again in ~{e.retry_after:.0f}s")
+            else:
+                self.add_system_message(f"Error regenerating response: {str(e)}")
+        finally:
+            self.enable_input()
+
+    def _show_candidates(self, candidates):
+        self.candidates, self.candidate_idx = candidates, 0
+        text = self.chat_history
+        text.configure(state=tk.NORMAL)
+        try:
+            if not text.tag_ranges("reply"):  # the original reply failed; start a fresh one
+                text.insert(tk.END, "\n[CatGPT] ", "assistant", candidates[0][0], ("assistant", "reply"),
+                            "\n", "assistant")
+            self.flip_bar = tk.Frame(text, bg="#2d2d2d")
+            tk.Button(self.flip_bar, text="◀", command=lambda: self._flip(-1),
+                      bg="#3d3d3d", fg="white", bd=0, padx=4).pack(side=tk.LEFT)
+            self.flip_label = tk.Label(self.flip_bar, bg="#2d2d2d", fg="#8a8a8a", font=("Arial", 9))
+            self.flip_label.pack(side=tk.LEFT, padx=4)
+            tk.Button(self.flip_bar, text="▶", command=lambda: self._flip(1),
+                      bg="#3d3d3d", fg="white", bd=0, padx=4).pack(side=tk.LEFT)
+            text.window_create(text.tag_ranges("reply")[1], window=self.flip_bar, padx=6)
+        finally:
+            text.configure(state=tk.DISABLED)
+        self._flip(0)
+
+    def _flip(self, step):
+        ranges = self.chat_history.tag_ranges("reply")
+        if not self.candidates or not ranges:
+            return
+        self.candidate_idx = (self.candidate_idx + step) % len(self.candidates)
+        shown, reply = self.candidates[self.candidate_idx]
+        text = self.chat_history
+        text.configure(state=tk.NORMAL)
+        try:
+            text.delete(*ranges)
+            text.insert(ranges[0], shown, ("assistant", "reply"))
+        finally:
+            text.configure(state=tk.DISABLED)
+        self.flip_label.configure(text=f"{self.candidate_idx + 1}/{len(self.candidates)}")
+        if step:
+            # the next prompt continues from whichever candidate is on screen
+            memory = self.cat_mind.engine.memory
+            memory.pop_last()
+            memory.add_turn(self.last_user_text, reply)
+
+    def _retire_candidates(self, keep_reply=False):
+        """Drop the flip controls; unless keep_reply, the last reply is frozen as plain text"""
+        text = self.chat_history
+        if self.flip_bar is not None:
+            text.configure(state=tk.NORMAL)
+            text.delete(self.flip_bar)
+            text.configure(state=tk.DISABLED)
+            self.flip_bar.destroy()
+            self.flip_bar = None
+        if not keep_reply:
+            text.tag_remove("reply", "1.0", tk.END)
+        self.candidates = []
+
+    # ---------- idle-time memory compaction ----------------------------
+    def _user_active(self):
+        if self._idle_job is not None:
+            self.master.after_cancel(self._idle_job)
+            self._idle_job = None
+        self._summary_cancel.set()  # a running summary gives the worker back at the next token
+
+    def _schedule_compaction(self):
+        if self._idle_job is None:
+            self._idle_job = self.master.after(self.IDLE_SUMMARY_MS, self._compact_when_idle)
+
+    def _compact_when_idle(self):
+        self._idle_job = None
+        self._summary_cancel = threading.Event()
+        self.aio.submit(self._compact_memory(self._summary_cancel))
+
+    async def _compact_memory(self, cancel):
+        try:
+            # batch priority: a new message is admitted ahead of a queued summary
+            async with self.admission.admit(BATCH):
+                if not cancel.is_set():
+                    await self.aio.run_blocking(self.cat_mind.engine.compact_memory, cancel)
+        except Rejected:
+            pass  # busy; the next idle period tries again
+        except Exception as e:
+            self.add_system_message(f"Could not summarize earlier turns: {str(e)}")
 
     def display_response(self, response):
-        self.chat_history.configure(state=tk.NORMAL)
-        self.chat_history.insert(tk.END, f"\n[CatGPT] {response}\n", "assistant")
-        self.chat_history.configure(state=tk.DISABLED)
-        self.chat_history.see(tk.END)
+        self.ui.append(self.chat_history, f"\n[CatGPT] {response}\n", "assistant")
 
 if __name__ == "__main__":
+    metrics.install_from_env()  # CATGPT_METRICS_PORT / CATGPT_METRICS_FILE
     root = tk.Tk()
     gui = CatGPTGUI(root)
     root.mainloop()
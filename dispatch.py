@@ -0,0 +1,119 @@
+import collections
+import queue
+import time
+
+import metrics
+
+# -------------------------------------------------------------
+#  Thread-safe UI dispatcher for the Tk frontends
+#  ------------------------------------------------------------
+#  • Worker threads post UI events instead of touching widgets
+#  • The Tk thread drains the queue once per frame (~16 ms)
+#  • Consecutive appends to the same Text widget become one insert
+#  • A per-frame time budget keeps a flood of events from freezing input
+#  • stats() (queue depth, coalescing, drain times) is exported as
+#    catgpt_ui_* metrics (CATGPT_METRICS_PORT / CATGPT_METRICS_FILE)
+# -------------------------------------------------------------
+
+
+class UIDispatcher:
+    """Queue of UI events drained on the Tk thread once per frame."""
+
+    FRAME_MS = 16
+    BUDGET_MS = 8
+
+    def __init__(self, root):
+        self.root = root
+        self._events = queue.SimpleQueue()
+        self._drain_times = collections.deque(maxlen=240)
+        self.max_depth = 0
+        self.drained = 0
+        self.appends = 0
+        self.inserts = 0
+        self._after_id = root.after(self.FRAME_MS, self._drain)
+        for key in self.stats():
+            metrics.collect(f"catgpt_ui_{key}", lambda key=key: self.stats()[key],
+                            "Tk UI dispatcher: " + key.replace("_", " "))
+
+    # ---------- any thread -------------------------------------------
+    def post(self, fn, *args):
+        """Run fn(*args) on the Tk thread at the next frame."""
+        self._events.put(("call", fn, args))
+
+    def append(self, widget, text: str, *tags):
+        """Append *text* to a (possibly disabled) Text widget and scroll to the end."""
+        self._events.put(("append", widget, (text, tags)))
+
+    # ---------- stats --------------------------------------------------
+    @property
+    def depth(self):
+        return self._events.qsize()
+
+    def stats(self):
+        times = sorted(self._drain_times)
+        return {
+            "queue_depth": self.depth,
+            "max_depth": self.max_depth,
+            "events_drained": self.drained,
+            "appends": self.appends,
+            "inserts": self.inserts,  # appends / inserts = coalescing factor
+            "drain_ms_last": self._drain_times[-1] if times else 0.0,
+            "drain_ms_p50": times[len(times) // 2] if times else 0.0,
+            "drain_ms_max": times[-1] if times else 0.0,
+        }
+
+    def stop(self):
+        if self._after_id:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    # ---------- Tk thread ----------------------------------------------
+    def _drain(self):
+        start = time.perf_counter()
+        deadline = start + self.BUDGET_MS / 1000
+        self.max_depth = max(self.max_depth, self.depth)
+        batch_widget, batch = None, []
+        while time.perf_counter() < deadline:
+            try:
+                kind, target, args = self._events.get_nowait()
+            except queue.Empty:
+                break
+            self.drained += 1
+            if kind == "append" and target is batch_widget:
+                batch.append(args)
+                continue
+            self._flush(batch_widget, batch)
+            batch_widget, batch = None, []
+            if kind == "append":
+                batch_widget, batch = target, [args]
+            else:
+                self._call(target, args)
+        self._flush(batch_widget, batch)
+        self._drain_times.append((time.perf_counter() - start) * 1000)
+        self._after_id = self.root.after(self.FRAME_MS, self._drain)
+
+    def _flush(self, widget, batch):
+        if not batch:
+            return
+        chunks = []
+        for text, tags in batch:
+            chunks.extend((text, tags))
+        self.appends += len(batch)
+        self.inserts += 1
+        try:
+            state = widget.cget("state")
+            widget.configure(state="normal")
+            widget.insert("end", *chunks)
+            widget.configure(state=state)
+            widget.see("end")
+        except Exception as e:
+            self.report(e)
+
+    def _call(self, fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            self.report(e)
+
+    def report(self, exc):
+        self.root.report_callback_exception(type(exc), exc, exc.__traceback__)
@@ -0,0 +1,77 @@
+import importlib.util
+import os
+import re
+import sys
+
+# -------------------------------------------------------------
+#  Engine registry shared by the server, router and load tools
+#  ------------------------------------------------------------
+#  The engines live inside the frontend scripts, so they are
+#  imported from file paths and wrapped in a common interface:
+#    generate(prompt) -> str
+#    stream(prompt)   -> iterator of text pieces
+# -------------------------------------------------------------
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+ENGINES = {
+    "deepseek-7b": ("clientv0.py", "DeepSeek7BEngine"),
+    "o3-mini-copycat": ("tunedon5.17.25acatgpt.py", "O3MiniCopycat"),
+    "gpt-4.1-mini": ("CATSEEKR1.v0.py", "GPT41Mini"),
+    "catmind": ("CatSEEKR1.py", "CatMind"),
+}
+
+_PIECE = re.compile(r"\S+\s*|\s+")
+
+
+def _load_module(filename):
+    name = "catgpt_engine_" + re.sub(r"\W", "_", filename[:-3])
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class Engine:
+    """Uniform wrapper around the rule engines and DeepSeek7BEngine."""
+
+    def __init__(self, name, impl):
+        self.name = name
+        self.impl = impl
+
+    def generate(self, prompt: str) -> str:
+        if hasattr(self.impl, "generate_response"):
+            return self.impl.generate_response(prompt)
+        return self.impl.generate(prompt)
+
+    def share_weights(self):
+        """Prepare a loaded model for fork(): move CPU tensors into shared memory."""
+        model = getattr(self.impl, "model", None)
+        if model is None:
+            return  # rule engines have nothing worth sharing
+        if any(p.is_cuda for p in model.parameters()):
+            raise RuntimeError("CUDA models cannot be shared with forked workers; use --workers 1")
+        model.share_memory()
+
+    def stream(self, prompt: str):
+        if hasattr(self.impl, "generate_stream"):
+            yield from self.impl.generate_stream(prompt)
+        else:
+            # rule engines answer at once; hand the reply out word by word
+            yield from _PIECE.findall(self.generate(prompt))
+
+
+def load_engine(name: str) -> Engine:
+    """Import, construct and (for model engines) initialize an engine by registry name."""
+    if name not in ENGINES:
+        raise KeyError(f"unknown engine {name!r}; choose from {', '.join(ENGINES)}")
+    filename, cls_name = ENGINES[name]
+    impl = getattr(_load_module(filename), cls_name)()
+    if hasattr(impl, "initialize_model"):
+        impl.initialize_model()
+    if hasattr(impl, "warmup"):
+        impl.warmup()  # before serving (and before forking workers)
+    return Engine(name, impl)
@@ -0,0 +1,147 @@
+import builtins
+import collections
+import hashlib
+import io
+import keyword
+import queue
+import threading
+import tokenize
+
+# -------------------------------------------------------------
+#  Off-thread syntax highlighting for code blocks in Text widgets
+#  ------------------------------------------------------------
+#  • Code is tokenized on a single background worker thread
+#  • Tag ranges are cached by a hash of the code (LRU)
+#  • Tags are applied on the Tk thread, one tag_add call per tag,
+#    and only for blocks that are currently scrolled into view
+# -------------------------------------------------------------
+
+TAG_COLORS = {
+    "kw": "#c678dd",
+    "builtin": "#61afef",
+    "defname": "#e5c07b",
+    "string": "#98c379",
+    "number": "#d19a66",
+    "comment": "#7f848e",
+}
+
+_BUILTINS = frozenset(dir(builtins))
+
+
+def tokenize_code(code: str):
+    """Return {tag: [start, end, start, end, ...]} Text indices for *code*."""
+    ranges = {tag: [] for tag in TAG_COLORS}
+    prev = None
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            tag = None
+            if tok.type == tokenize.NAME:
+                if keyword.iskeyword(tok.string):
+                    tag = "kw"
+                elif prev in ("def", "class"):
+                    tag = "defname"
+                elif tok.string in _BUILTINS:
+                    tag = "builtin"
+            elif tok.type == tokenize.STRING:
+                tag = "string"
+            elif tok.type == tokenize.NUMBER:
+                tag = "number"
+            elif tok.type == tokenize.COMMENT:
+                tag = "comment"
+            if tag:
+                ranges[tag].append("%d.%d" % tok.start)
+                ranges[tag].append("%d.%d" % tok.end)
+            if tok.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT):
+                prev = tok.string
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass  # keep whatever was tokenized before the broken part
+    return {tag: idx for tag, idx in ranges.items() if idx}
+
+
+def visible_in_canvas(canvas, widget):
+    """True if *widget* (packed inside a canvas window) overlaps the viewport."""
+    if not widget.winfo_ismapped():
+        return False
+    top = canvas.winfo_rooty()
+    bottom = top + canvas.winfo_height()
+    y = widget.winfo_rooty()
+    return y + widget.winfo_height() >= top and y <= bottom
+
+
+class CodeHighlighter:
+    """Tokenizes code off the Tk thread and applies cached tag ranges in batches."""
+
+    POLL_MS = 30
+
+    def __init__(self, root, is_visible=None, max_cache=512):
+        self.root = root
+        self.is_visible = is_visible or (lambda w: w.winfo_ismapped())
+        self.max_cache = max_cache
+        self._cache = collections.OrderedDict()  # code hash -> ranges
+        self._pending = []  # [(widget, key, code)] waiting for ranges or visibility
+        self._inflight = set()
+        self._jobs = queue.SimpleQueue()
+        self._done = queue.SimpleQueue()
+        self._polling = False
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    # ---------- Tk thread ----------------------------------------------
+    def register(self, widget, code: str):
+        """Queue *widget* (a Text holding *code*) for highlighting."""
+        for tag, color in TAG_COLORS.items():
+            widget.tag_configure(tag, foreground=color)
+        key = hashlib.blake2b(code.encode("utf-8"), digest_size=16).digest()
+        self._pending.append((widget, key, code))
+        if key not in self._cache and key not in self._inflight:
+            self._submit(key, code)
+        else:
+            self.root.after_idle(self.refresh)
+
+    def refresh(self, *_):
+        """Apply highlighting to pending blocks that are ready and in view."""
+        while True:
+            try:
+                key, ranges = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._inflight.discard(key)
+            self._cache[key] = ranges
+            while len(self._cache) > self.max_cache:
+                self._cache.popitem(last=False)
+        still_pending = []
+        for widget, key, code in self._pending:
+            try:
+                if not widget.winfo_exists():
+                    continue
+                ranges = self._cache.get(key)
+                if ranges is None and key not in self._inflight:
+                    self._submit(key, code)  # evicted before it was shown
+                if ranges is None or not self.is_visible(widget):
+                    still_pending.append((widget, key, code))
+                    continue
+                self._cache.move_to_end(key)
+                for tag, indices in ranges.items():
+                    widget.tag_add(tag, *indices)
+            except Exception:
+                continue  # widget torn down mid-refresh
+        self._pending = still_pending
+
+    def _submit(self, key, code):
+        self._inflight.add(key)
+        self._jobs.put((key, code))
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        self.refresh()
+        if self._inflight:
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    # ---------- worker thread ------------------------------------------
+    def _worker(self):
+        while True:
+            key, code = self._jobs.get()
+            self._done.put((key, tokenize_code(code)))
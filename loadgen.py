@@ -0,0 +1,186 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# -------------------------------------------------------------
+#  Load generator: simulated concurrent chat users
+#  ------------------------------------------------------------
+#  • Each simulated user picks a prompt from a weighted mix, waits
+#    for the reply, then "reads and types" for an exponential think
+#    time before the next turn
+#  • Drives an engine in-process (engines.py / router.py; calls are
+#    limited to --concurrency at once, like server.py's executor) or
+#    a running server.py over HTTP (--url)
+#  • Steps through --users counts and prints a throughput / latency
+#    curve plus the saturation point: the smallest user count that
+#    already reaches 90% of the peak throughput
+#  Usage: python loadgen.py --engine o3-mini-copycat --users 1 2 4 8 16 32
+#         python loadgen.py --url http://127.0.0.1:8000/v1 --think 2
+# -------------------------------------------------------------
+
+# (weight, prompt) - short chit-chat dominates, with a tail of code and long questions
+PROMPT_MIX = (
+    (30, "hi"),
+    (15, "tell me a joke"),
+    (20, "what is the capital of France?"),
+    (10, "I feel sad today"),
+    (15, "write a python function that reverses a string"),
+    (10, "explain how a hash map works and when its lookups stop being O(1), with an example in python"),
+)
+SATURATION_FRACTION = 0.9
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# ---------- targets ------------------------------------------------------
+class Rejected(Exception):
+    pass
+
+
+def engine_target(names, concurrency=1, route="hedge"):
+    """In-process target: one engine, or several behind a router."""
+    from engines import load_engine
+    from router import load_router
+
+    engine = load_router(names, mode=route) if len(names) > 1 else load_engine(names[0])
+    slots = threading.BoundedSemaphore(concurrency)
+
+    def call(prompt):
+        with slots:
+            return engine.generate(prompt)
+    return engine.name, call
+
+
+def http_target(base_url, timeout_s=120.0):
+    """Target a running server.py (or any OpenAI-compatible endpoint)."""
+    url = base_url.rstrip("/") + "/chat/completions"
+
+    def call(prompt):
+        body = json.dumps({"model": "local", "messages": [{"role": "user", "content": prompt}]}).encode()
+        request = urllib.request.Request(url, body, {"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout_s) as resp:
+                return json.load(resp)["choices"][0]["message"]["content"]
+        except urllib.error.HTTPError as exc:
+            if exc.code == 429:
+                raise Rejected(exc.headers.get("Retry-After", "")) from None
+            raise
+    return base_url, call
+
+
+# ---------- simulation ---------------------------------------------------
+def _user(call, mix, think_s, stop_at, rng, results):
+    prompts = [p for _, p in mix]
+    weights = [w for w, _ in mix]
+    if think_s:
+        time.sleep(rng.uniform(0, think_s))  # users do not all arrive in the same instant
+    while time.monotonic() < stop_at:
+        prompt = rng.choices(prompts, weights)[0]
+        start = time.monotonic()
+        try:
+            reply, status = call(prompt), "ok"
+        except Rejected:
+            reply, status = "", "rejected"
+        except Exception:
+            reply, status = "", "error"
+        end = time.monotonic()
+        results.append((end, end - start, status, len(reply.split())))
+        if think_s:
+            time.sleep(min(rng.expovariate(1.0 / think_s), max(0.0, stop_at - time.monotonic())))
+
+
+def run_step(call, users, duration_s, think_s, mix=PROMPT_MIX, seed=0):
+    """Run *users* simulated users for duration_s seconds; returns one curve point."""
+    results = []
+    stop_at = time.monotonic() + duration_s
+    threads = [threading.Thread(target=_user, args=(call, mix, think_s, stop_at, random.Random(seed + i), results),
+                                daemon=True) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    ok = sorted(lat for end, lat, status, _ in results if status == "ok")
+    in_window = [r for r in results if r[0] <= stop_at and r[2] == "ok"]
+    return {
+        "users": users,
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected": sum(1 for r in results if r[2] == "rejected"),
+        "errors": sum(1 for r in results if r[2] == "error"),
+        "throughput_rps": round(len(in_window) / duration_s, 3),
+        "tokens_per_s": round(sum(r[3] for r in in_window) / duration_s, 1),
+        "p50_s": percentile(ok, 0.50),
+        "p95_s": percentile(ok, 0.95),
+        "p99_s": percentile(ok, 0.99),
+    }
+
+
+def saturation_point(curve):
+    """Smallest user count that reaches SATURATION_FRACTION of the peak throughput."""
+    peak = max((p["throughput_rps"] for p in curve), default=0)
+    if not peak:
+        return None
+    return next(p["users"] for p in curve if p["throughput_rps"] >= SATURATION_FRACTION * peak)
+
+
+def _fmt(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent chat users against an engine or server")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--engine", action="append", help="engine name from engines.py; repeat to route across several")
+    target.add_argument("--url", help="base URL of a running server, e.g. http://127.0.0.1:8000/v1")
+    parser.add_argument("--route", default="hedge", choices=("hedge", "fanout"))
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel engine calls in-process")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per step")
+    parser.add_argument("--think", type=float, default=1.0, help="mean think time between turns in seconds (0 = closed loop)")
+    parser.add_argument("--prompts", help="file with one prompt per line (equal weights) instead of the built-in mix")
+    parser.add_argument("--out", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    mix = PROMPT_MIX
+    if args.prompts:
+        with open(args.prompts) as f:
+            mix = tuple((1, line.strip()) for line in f if line.strip())
+    if args.url:
+        name, call = http_target(args.url)
+    else:
+        name, call = engine_target(args.engine or ["o3-mini-copycat"], args.concurrency, args.route)
+
+    curve = []
+    print(f"{'users':>6} {'req/s':>8} {'tok/s':>8} {'p50':>10} {'p95':>10} {'p99':>10} {'rej':>5} {'err':>5}")
+    for users in args.users:
+        point = run_step(call, users, args.duration, args.think, mix)
+        curve.append(point)
+        print(f"{users:>6} {point['throughput_rps']:>8.2f} {point['tokens_per_s']:>8.1f} {_fmt(point['p50_s']):>10} "
+              f"{_fmt(point['p95_s']):>10} {_fmt(point['p99_s']):>10} {point['rejected']:>5} {point['errors']:>5}",
+              flush=True)
+    saturation = saturation_point(curve)
+    if saturation is None:
+        print("saturation: no completed requests")
+    elif len(curve) > 1 and saturation == curve[-1]["users"]:
+        print(f"saturation: not reached by {saturation} users; throughput is still climbing")
+    else:
+        print(f"saturation: ~{saturation} users")
+
+    if args.out:
+        report = {"target": name, "think_s": args.think, "duration_s": args.duration,
+                  "curve": curve, "saturation_users": saturation}
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import collections
+import gc
+import os
+import tkinter as tk
+import tracemalloc
+from tkinter import END, Button, Frame, Toplevel, scrolledtext
+
+# -------------------------------------------------------------
+#  Opt-in memory diagnostics for the Tk frontends
+#  ------------------------------------------------------------
+#  • Each snapshot records a tracemalloc snapshot, a census of live
+#    Tk widgets by class, Python widget wrappers still reachable
+#    after their Tk widget was destroyed, registered Tcl commands,
+#    the frontend's own counters (conversations, messages, ...) and RSS
+#  • The report shows the growth since the previous snapshot, with
+#    the allocation sites that grew the most
+#  Start tracing at launch with CATGPT_MEMDIAG=1 (frames:
+#  CATGPT_MEMDIAG_FRAMES); otherwise it starts when the panel opens
+# -------------------------------------------------------------
+
+TOP_SITES = 12
+_IGNORE = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+           tracemalloc.Filter(False, "<unknown>"))
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None  # not Linux; tracemalloc totals are still shown
+
+
+def widget_census(root):
+    """Count live Tk widgets under root by class (Tk-side, not Python wrappers)."""
+    counts, stack = collections.Counter(), [root]
+    while stack:
+        widget = stack.pop()
+        counts[widget.winfo_class()] += 1
+        stack.extend(widget.winfo_children())
+    return counts
+
+
+def orphaned_wrappers():
+    """Python widget objects whose Tk widget is gone but which something still references."""
+    orphans = 0
+    for obj in gc.get_objects():
+        if isinstance(obj, tk.Misc) and not isinstance(obj, tk.Tk):
+            try:
+                alive = obj.tk.call("winfo", "exists", obj._w)
+            except tk.TclError:
+                alive = 0
+            orphans += not alive
+    return orphans
+
+
+class MemorySnapshot:
+    def __init__(self, root, counters):
+        self.widgets = widget_census(root)
+        self.orphans = orphaned_wrappers()
+        self.tcl_commands = len(root.tk.call("info", "commands"))
+        self.counters = dict(counters)
+        self.rss = _rss_bytes()
+        self.traced = tracemalloc.take_snapshot().filter_traces(_IGNORE)
+
+
+class MemoryDiagnostics:
+    """Takes snapshots and renders growth reports; counters() supplies app-level counts."""
+
+    def __init__(self, root, counters=dict, frames=None):
+        self.root = root
+        self.counters = counters
+        self.frames = frames or int(os.environ.get("CATGPT_MEMDIAG_FRAMES", "8"))
+        self.snapshots = []
+        self.panel = None
+
+    @classmethod
+    def install_from_env(cls, root, counters=dict):
+        diagnostics = cls(root, counters)
+        if os.environ.get("CATGPT_MEMDIAG"):
+            diagnostics.start()
+        return diagnostics
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def snapshot(self):
+        """Take a snapshot and return the report; runs on the Tk thread, which the census needs."""
+        self.start()
+        snap = MemorySnapshot(self.root, self.counters())
+        previous = self.snapshots[-1] if self.snapshots else None
+        self.snapshots = [previous, snap] if previous else [snap]  # keep two, snapshots are big
+        return self.report(previous, snap)
+
+    # ---------- report -------------------------------------------------
+    @staticmethod
+    def _delta(name, before, after):
+        if before is None:
+            return f"  {name:<28} {after:>10}"
+        return f"  {name:<28} {after:>10} ({after - before:+})"
+
+    def report(self, before, after):
+        traced = sum(stat.size for stat in after.traced.statistics("filename"))
+        lines = ["=== baseline ===" if before is None else "=== growth since previous snapshot ==="]
+        if after.rss is not None:
+            lines.append(self._delta("RSS (KiB)", before and before.rss // 1024, after.rss // 1024))
+        lines.append(self._delta("traced Python heap (KiB)",
+                                 before and sum(s.size for s in before.traced.statistics("filename")) // 1024,
+                                 traced // 1024))
+        for name, value in after.counters.items():
+            lines.append(self._delta(name, before and before.counters.get(name, 0), value))
+        lines.append(self._delta("Tcl commands", before and before.tcl_commands, after.tcl_commands))
+        lines.append(self._delta("orphaned widget wrappers", before and before.orphans, after.orphans))
+        lines.append("  live widgets by class:")
+        for cls in sorted(set(after.widgets) | set(before.widgets if before else ())):
+            lines.append("  " + self._delta(cls, before and before.widgets.get(cls, 0), after.widgets.get(cls, 0)))
+        if before is not None:
+            lines.append(f"  top {TOP_SITES} growing allocation sites:")
+            for stat in after.traced.compare_to(before.traced, "traceback")[:TOP_SITES]:
+                if stat.size_diff <= 0:
+                    break
+                frame = stat.traceback[0]
+                lines.append(f"    {stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+7} blocks  "
+                             f"{os.path.basename(frame.filename)}:{frame.lineno}")
+                for caller in list(stat.traceback)[1:4]:
+                    lines.append(f"        <- {os.path.basename(caller.filename)}:{caller.lineno}")
+        return "\n".join(lines) + "\n"
+
+    # ---------- panel --------------------------------------------------
+    def open_panel(self):
+        if self.panel is not None and self.panel.winfo_exists():
+            self.panel.lift()
+            return
+        self.panel = Toplevel(self.root)
+        self.panel.title("Memory diagnostics")
+        self.panel.geometry("640x480")
+        self.output = scrolledtext.ScrolledText(self.panel, bg="#181e1b", fg="#e2e8f0", font=("Consolas", 10))
+        self.output.pack(fill="both", expand=True, padx=8, pady=(8, 4))
+        bar = Frame(self.panel)
+        bar.pack(fill="x", padx=8, pady=(0, 8))
+        Button(bar, text="Take snapshot", command=self._on_snapshot).pack(side="left")
+        Button(bar, text="Close", command=self._close_panel).pack(side="right")
+        self.panel.protocol("WM_DELETE_WINDOW", self._close_panel)
+        self.start()
+        self.output.insert(END, f"tracemalloc tracing {tracemalloc.get_traceback_limit()} frames; "
+                                "take a snapshot, use the app, then take another.\n\n")
+
+    def _on_snapshot(self):
+        self.output.insert(END, self.snapshot() + "\n")
+        self.output.see(END)
+
+    def _close_panel(self):
+        self.panel.destroy()
+        self.panel = self.output = None  # or the panel itself shows up as orphaned wrappers
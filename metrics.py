@@ -0,0 +1,165 @@
+import atexit
+import bisect
+import contextlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -------------------------------------------------------------
+#  Pipeline metrics in Prometheus text format
+#  ------------------------------------------------------------
+#  • Histograms and counters keyed by name + labels
+#  • stage("decode") times a block into catgpt_stage_seconds
+#  • collect() reports a live value (queue depth, ...) read at render
+#  • Exposed by server.py at /metrics, by a standalone local endpoint
+#    (CATGPT_METRICS_PORT) and by a dump file (CATGPT_METRICS_FILE)
+# -------------------------------------------------------------
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines, running = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            running += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(dict(labels, le=le))} {running}")
+        lines.append(f"{name}_sum{_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{_labels(labels)} {self.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> float
+        self._collected = {}  # (name, labels) -> callable
+        self._help = {}
+
+    def observe(self, name, value, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help_text))
+            self._histograms.setdefault(key, Histogram()).observe(value)
+
+    def inc(self, name, amount=1, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("counter", help_text))
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def collect(self, name, fn, help_text="", kind="gauge", **labels):
+        """Report fn() under *name* at every render; kind is "gauge" or "counter"."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, (kind, help_text))
+            self._collected[key] = fn
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        """Time the enclosed block as one pipeline stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("catgpt_stage_seconds", time.perf_counter() - start,
+                         "Time spent per generation pipeline stage", stage=stage)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            out = []
+            for name, (kind, help_text) in sorted(self._help.items()):
+                out.append(f"# HELP {name} {help_text or name}")
+                out.append(f"# TYPE {name} {kind}")
+                if kind == "histogram":
+                    for (n, labels), hist in sorted(self._histograms.items()):
+                        if n == name:
+                            out.extend(hist.render(name, dict(labels)))
+                else:
+                    for (n, labels), value in sorted(self._counters.items()):
+                        if n == name:
+                            out.append(f"{name}{_labels(dict(labels))} {value}")
+                    for (n, labels), fn in sorted(self._collected.items(), key=lambda item: item[0]):
+                        if n == name:
+                            try:
+                                value = fn()
+                            except Exception:
+                                continue  # a broken collector must not take /metrics down
+                            out.append(f"{name}{_labels(dict(labels))} {value}")
+            return "\n".join(out) + "\n"
+
+    def dump(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+REGISTRY = Registry()
+stage = REGISTRY.stage
+observe = REGISTRY.observe
+inc = REGISTRY.inc
+collect = REGISTRY.collect
+
+
+# ---------- exposure -----------------------------------------------------
+def start_http_endpoint(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve GET /metrics from a daemon thread; returns the HTTP server."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, name="catgpt-metrics", daemon=True).start()
+    return httpd
+
+
+def start_dump_file(path, interval_s=15.0, registry=REGISTRY):
+    """Rewrite *path* every interval_s seconds and once more at exit."""
+    def loop():
+        while True:
+            time.sleep(interval_s)
+            registry.dump(path)
+
+    threading.Thread(target=loop, name="catgpt-metrics-dump", daemon=True).start()
+    atexit.register(registry.dump, path)
+
+
+def install_from_env(registry=REGISTRY):
+    """Start the exporters requested by CATGPT_METRICS_PORT / CATGPT_METRICS_FILE."""
+    if os.environ.get("CATGPT_METRICS_PORT"):
+        start_http_endpoint(int(os.environ["CATGPT_METRICS_PORT"]), registry=registry)
+    if os.environ.get("CATGPT_METRICS_FILE"):
+        start_dump_file(os.environ["CATGPT_METRICS_FILE"], registry=registry)
@@ -0,0 +1,149 @@
+import random
+
+# -------------------------------------------------------------
+#  Incremental postprocessing for streamed model output
+#  ------------------------------------------------------------
+#  Each stage has feed(text) -> text and finish() -> text and keeps
+#  only a small rolling window, so pieces flow to the user as soon
+#  as they are decoded and nothing is left to do after the last token.
+#  Text returned by a stage's finish() still passes through the
+#  stages after it.
+# -------------------------------------------------------------
+
+AHA_TRIGGERS = (
+    ("insight", "✨ Aha Moment: Neural Pathways Activated"),
+    ("realize", "🔍 Pattern Recognized: Cognitive Leap Detected"),
+    ("understand", "🎯 Knowledge Integration: Concept Mastered"),
+)
+
+
+class StopSequenceStage:
+    """Cuts the stream at the first stop string, holding back text that could start one."""
+
+    def __init__(self, stops):
+        self.stops = tuple(stops)
+        self._hold = max((len(s) for s in self.stops), default=1) - 1
+        self._buffer = ""
+        self._started = False
+        self.stopped = False
+
+    def feed(self, text):
+        if self.stopped:
+            return ""
+        self._buffer += text
+        if not self._started:
+            # leading blank lines are not a stop; the reply has not started yet
+            self._buffer = self._buffer.lstrip()
+            if not self._buffer:
+                return ""
+            self._started = True
+        cut = min((i for i in (self._buffer.find(s) for s in self.stops) if i >= 0), default=-1)
+        if cut >= 0:
+            self.stopped = True
+            out, self._buffer = self._buffer[:cut], ""
+            return out
+        # release everything that can no longer be the start of a stop string
+        keep = 0
+        for n in range(min(self._hold, len(self._buffer)), 0, -1):
+            tail = self._buffer[-n:]
+            if any(s.startswith(tail) for s in self.stops):
+                keep = n
+                break
+        out = self._buffer[:len(self._buffer) - keep]
+        self._buffer = self._buffer[len(self._buffer) - keep:]
+        return out
+
+    def finish(self):
+        out, self._buffer = self._buffer, ""
+        return out
+
+
+class CleanupStage:
+    """Drops leading whitespace and holds back trailing whitespace until more text arrives."""
+
+    def __init__(self):
+        self._started = False
+        self._pending_ws = ""
+
+    def feed(self, text):
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+        body = text.rstrip()
+        if not body:
+            self._pending_ws += text
+            return ""
+        out = self._pending_ws + body
+        self._pending_ws = text[len(body):]
+        return out
+
+    def finish(self):
+        self._pending_ws = ""
+        return ""
+
+
+class AhaTriggerStage:
+    """Watches for trigger words across piece boundaries; appends an aha line at the end."""
+
+    def __init__(self, triggers=AHA_TRIGGERS):
+        self.triggers = triggers
+        self._window = max(len(t) for t, _ in triggers) - 1
+        self._tail = ""
+        self.fired = False
+
+    def feed(self, text):
+        if not self.fired and text:
+            haystack = self._tail + text.lower()
+            self.fired = any(trigger in haystack for trigger, _ in self.triggers)
+            self._tail = haystack[-self._window:]
+        return text
+
+    def finish(self):
+        if not self.fired:
+            return ""
+        return f"\n[NPU SYSTEM]: {random.choice(self.triggers)[1]}"
+
+
+class TelemetryStage:
+    """Counts whitespace-separated tokens as they pass and appends the telemetry footer."""
+
+    def __init__(self, vram_usage):
+        self.vram_usage = vram_usage  # callable, evaluated once at the end
+        self.tokens = 0
+        self._in_word = False
+
+    def feed(self, text):
+        for ch in text:
+            if ch.isspace():
+                self._in_word = False
+            elif not self._in_word:
+                self._in_word = True
+                self.tokens += 1
+        return text
+
+    def finish(self):
+        return f"\n[Telemetry: VRAM Usage: {self.vram_usage()} | Tokens: {self.tokens}]"
+
+
+class StreamPostprocessor:
+    """Chains stages; feed() and finish() return the text ready to show."""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+
+    def feed(self, text):
+        for stage in self.stages:
+            text = stage.feed(text)
+        return text
+
+    def finish(self):
+        out = ""
+        for stage in self.stages:
+            out = stage.feed(out) + stage.finish()
+        return out
+
+    def run(self, text):
+        """Postprocess a complete string in one go."""
+        return self.feed(text) + self.finish()
@@ -0,0 +1,106 @@
+import collections
+import itertools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+# -------------------------------------------------------------
+#  On-demand per-request profiler
+#  ------------------------------------------------------------
+#  • begin() starts a sampler thread that snapshots every thread's
+#    Python stack (sys._current_frames) every few milliseconds, so
+#    the engine call on the worker pool and the render on the Tk
+#    thread land in the same profile
+#  • stop() writes one folded-stack file per request
+#    ("thread;outer;...;leaf count" lines) for flamegraph.pl,
+#    speedscope or inferno
+#  • Idle threads (blocked in wait/select/mainloop) are skipped so
+#    the graph shows work, not waiting
+#  • Sessions are not tied to a thread, so requests that overlap show
+#    up in each other's profiles; stop() logs when that happened
+#  Enable with CATGPT_PROFILE=1 (output: CATGPT_PROFILE_DIR) or from
+#  the Diagnostics menu of the frontends
+# -------------------------------------------------------------
+
+log = logging.getLogger("catgpt.profiler")
+
+IDLE_LEAVES = frozenset({"wait", "select", "mainloop", "_worker", "_wait_for_tstate_lock"})
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+
+class ProfileSession:
+    def __init__(self, profiler, label):
+        self.profiler = profiler
+        self.label = label
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.started = time.time()
+        self.seq = next(profiler._seq)
+        self.overlapped = bool(profiler._active)
+        profiler._active.add(self)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="catgpt-profiler", daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.profiler.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me or frame.f_code.co_name in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        """Stop sampling and write the folded stacks; returns the file path."""
+        self._stop.set()
+        self._thread.join()
+        self.profiler._active.discard(self)
+        os.makedirs(self.profiler.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        # labels repeat ("reply"), so the sequence number keeps same-second requests apart
+        name = f"{stamp}-{self.seq:05d}-{_UNSAFE.sub('_', self.label)}.folded"
+        path = os.path.join(self.profiler.out_dir, name)
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        log.info("profile for %s: %d samples over %.2fs -> %s",
+                 self.label, self.samples, time.time() - self.started, path)
+        if self.overlapped or self.profiler._active:
+            log.warning("profile %s overlapped another request; their stacks are mixed", path)
+        return path
+
+
+class RequestProfiler:
+    """Hands out a ProfileSession per request while enabled; cheap no-op otherwise."""
+
+    INTERVAL_S = 0.002
+
+    def __init__(self, out_dir="profiles", enabled=False, interval_s=INTERVAL_S):
+        self.out_dir = out_dir
+        self.enabled = enabled
+        self.interval_s = interval_s
+        self._seq = itertools.count(1)
+        self._active = set()
+
+    @classmethod
+    def install_from_env(cls):
+        """Always returns a profiler; CATGPT_PROFILE=1 switches it on from the start."""
+        return cls(out_dir=os.environ.get("CATGPT_PROFILE_DIR", "profiles"),
+                   enabled=bool(os.environ.get("CATGPT_PROFILE")))
+
+    def begin(self, label):
+        """Start profiling one request; returns a session to stop(), or None when disabled."""
+        if not self.enabled:
+            return None
+        return ProfileSession(self, label)
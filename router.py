@@ -0,0 +1,188 @@
+import collections
+import queue
+import threading
+import time
+
+from engines import load_engine
+import metrics
+
+# -------------------------------------------------------------
+#  Hedged / fan-out routing across engines and replicas
+#  ------------------------------------------------------------
+#  • "fanout": every engine gets the prompt at once
+#  • "hedge" : the first engine gets it now; the next one only if no
+#    answer has arrived after that engine's p95 latency (or at once
+#    if it fails or gives an unacceptable reply)
+#  • generate() returns the first acceptable reply; stream() commits
+#    to the first engine that starts answering. Losers are cancelled:
+#    their streams are closed, which stops a model's decode loop
+#  • A Router has the same interface as engines.Engine, so the server
+#    and the frontends can use it in place of a single engine
+# -------------------------------------------------------------
+
+DEFAULT_HEDGE_S = 2.0
+MIN_SAMPLES = 20
+_PIECE, _DONE, _ERROR = "piece", "done", "error"
+
+
+class NoAcceptableReply(RuntimeError):
+    pass
+
+
+class _Race:
+    """One routed request: launches attempts on schedule and hands out their events."""
+
+    def __init__(self, router, prompt):
+        self.router = router
+        self.prompt = prompt
+        self.events = queue.Queue()
+        self.cancels = []
+        self.live = set()
+        self.launching = True
+        self.next_launch = 0.0
+        self.last_error = None
+
+    def _can_launch(self):
+        return self.launching and len(self.cancels) < len(self.router.engines)
+
+    def _launch(self):
+        slot, cancel = len(self.cancels), threading.Event()
+        self.cancels.append(cancel)
+        self.live.add(slot)
+        threading.Thread(target=self.router._attempt, args=(slot, self.prompt, self.events, cancel),
+                         name=f"router-{self.router.engines[slot].name}", daemon=True).start()
+        self.next_launch = time.monotonic() + self.router.hedge_delay(slot)
+        if slot:
+            metrics.inc("catgpt_router_hedges_total", 1, "Extra attempts launched by the router",
+                        engine=self.router.engines[slot].name)
+
+    def next_event(self):
+        while True:
+            if self._can_launch() and (not self.live or time.monotonic() >= self.next_launch):
+                self._launch()
+                continue
+            if not self.live:
+                raise NoAcceptableReply("no engine returned an acceptable reply") from self.last_error
+            timeout = max(0.0, self.next_launch - time.monotonic()) if self._can_launch() else None
+            try:
+                slot, kind, value = self.events.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if kind != _PIECE:
+                self.live.discard(slot)
+            if kind == _ERROR:
+                self.last_error = value
+            return slot, kind, value
+
+    def settle(self, winner=None):
+        """Stop hedging and cancel every attempt except *winner*."""
+        self.launching = False
+        for slot, cancel in enumerate(self.cancels):
+            if slot != winner:
+                cancel.set()
+
+
+class Router:
+    def __init__(self, engines, mode="hedge", hedge_after_s=None, accept=None):
+        if mode not in ("hedge", "fanout"):
+            raise ValueError(f"unknown routing mode {mode!r}")
+        self.engines = list(engines)
+        self.name = "+".join(e.name for e in self.engines)
+        self.mode = mode
+        self.hedge_after_s = hedge_after_s  # fixed delay; None -> per-engine p95
+        self.accept = accept or (lambda text: bool(text.strip()))
+        self._latency = [collections.deque(maxlen=200) for _ in self.engines]
+        # one engine instance never runs two prompts at once; replicas are separate instances
+        self._locks = [threading.Lock() for _ in self.engines]
+
+    def p95(self, slot):
+        samples = sorted(self._latency[slot])
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def hedge_delay(self, slot):
+        if self.mode == "fanout":
+            return 0.0
+        if self.hedge_after_s is not None:
+            return self.hedge_after_s
+        p95 = self.p95(slot)
+        return DEFAULT_HEDGE_S if p95 is None else p95
+
+    def _attempt(self, slot, prompt, events, cancel):
+        engine = self.engines[slot]
+        with self._locks[slot]:
+            if cancel.is_set():
+                return  # lost the race while waiting for this engine
+            start = time.perf_counter()
+            pieces = engine.stream(prompt)
+            try:
+                for piece in pieces:
+                    if cancel.is_set():
+                        return
+                    events.put((slot, _PIECE, piece))
+            except Exception as exc:
+                events.put((slot, _ERROR, exc))
+                return
+            finally:
+                pieces.close()
+            self._latency[slot].append(time.perf_counter() - start)
+            events.put((slot, _DONE, None))
+
+    def _won(self, slot):
+        metrics.inc("catgpt_router_wins_total", 1, "Routed requests answered per engine",
+                    engine=self.engines[slot].name)
+
+    # ---------- Engine interface ---------------------------------------
+    def generate(self, prompt: str) -> str:
+        race, texts = _Race(self, prompt), collections.defaultdict(list)
+        try:
+            while True:
+                slot, kind, value = race.next_event()
+                if kind == _PIECE:
+                    texts[slot].append(value)
+                elif kind == _DONE:
+                    text = "".join(texts.pop(slot, ()))
+                    if self.accept(text):
+                        self._won(slot)
+                        return text
+                    race.next_launch = 0.0  # unacceptable: hedge right away
+                else:
+                    race.next_launch = 0.0
+        finally:
+            race.settle()
+
+    def stream(self, prompt: str):
+        race, buffered, winner = _Race(self, prompt), collections.defaultdict(list), None
+        try:
+            while True:
+                slot, kind, value = race.next_event()
+                if winner is None:
+                    if kind == _PIECE:
+                        buffered[slot].append(value)
+                        if not value.strip():
+                            continue
+                        winner = slot
+                        race.settle(winner)
+                        self._won(winner)
+                        yield from buffered.pop(winner)
+                    else:
+                        race.next_launch = 0.0  # finished or failed without saying anything
+                elif slot == winner:
+                    if kind == _PIECE:
+                        yield value
+                    elif kind == _DONE:
+                        return
+                    else:
+                        raise value
+        finally:
+            race.settle()
+
+    def share_weights(self):
+        for engine in self.engines:
+            engine.share_weights()
+
+
+def load_router(names, mode="hedge", hedge_after_s=None):
+    """Load each named engine (repeat a name for replicas) behind one Router."""
+    return Router([load_engine(name) for name in names], mode=mode, hedge_after_s=hedge_after_s)
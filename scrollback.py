@@ -0,0 +1,145 @@
+import os
+import tempfile
+
+# -------------------------------------------------------------
+#  Bounded scrollback for Text / ScrolledText chat panes
+#  ------------------------------------------------------------
+#  • Keeps at most max_lines in the widget; trims the oldest lines
+#    in chunks of chunk_lines once the limit is exceeded
+#  • Trimmed text is appended to an on-disk log; the tag ranges of
+#    each chunk (user/assistant/...) stay in memory and are restored
+#    when it comes back
+#  • Scrolling to the very top pages the previous chunk back in
+#  • The default log is a private temp file, deleted when the widget is
+#    destroyed; a caller-supplied log_path is left on disk
+# -------------------------------------------------------------
+
+DEFAULT_MAX_LINES = int(os.environ.get("CATGPT_SCROLLBACK_LINES", "5000"))
+
+
+class Scrollback:
+    """Caps a Text widget at max_lines, spilling older lines to a log file."""
+
+    def __init__(self, widget, max_lines=DEFAULT_MAX_LINES, chunk_lines=None, log_path=None, scrollbar=None):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.chunk_lines = chunk_lines or max(1, max_lines // 5)
+        self._owns_log = log_path is None
+        if log_path is None:
+            fd, log_path = tempfile.mkstemp(prefix="catgpt-scrollback-", suffix=".log")
+            os.close(fd)
+        self.log_path = log_path
+        self._log = open(log_path, "a+b")
+        self._chunks = []  # [(offset, nbytes, nlines, [(tag, start, end)])] in chat order
+        self._top_chunk = 0  # chunks[:_top_chunk] live only on disk
+        self._busy = False
+        self._trim_pending = False
+
+        self._scrollbar = scrollbar or getattr(widget, "vbar", None)
+        widget.configure(yscrollcommand=self._on_yscroll)
+        widget.tag_configure("history", foreground="#8a8a8a")
+        widget.bind("<<Modified>>", self._on_modified, add="+")
+        widget.edit_modified(False)
+        widget.bind("<Destroy>", self._on_destroy, add="+")
+
+    # ---------- widget hooks -------------------------------------------
+    def _on_modified(self, _event=None):
+        if not self.widget.edit_modified():
+            return  # the reset below fires <<Modified>> again
+        self.widget.edit_modified(False)
+        if not self._busy and not self._trim_pending:
+            self._trim_pending = True
+            self.widget.after_idle(self.trim)
+
+    def _on_yscroll(self, first, last):
+        if self._scrollbar is not None:
+            self._scrollbar.set(first, last)
+        if float(first) <= 0.0 and self._top_chunk > 0 and not self._busy:
+            self.widget.after_idle(self.page_in)
+
+    def _on_destroy(self, event):
+        if event.widget is self.widget:
+            self.close()
+
+    # ---------- trimming / paging --------------------------------------
+    def line_count(self):
+        return int(self.widget.index("end-1c").split(".")[0])
+
+    def trim(self):
+        """Spill the oldest lines to disk until the widget is back under max_lines."""
+        self._trim_pending = False
+        if self._log.closed:
+            return  # an idle callback that outlived the widget
+        at_bottom = self.widget.yview()[1] >= 1.0
+        # While the user reads paged-in history, only trim past a hard cap
+        limit = self.max_lines if at_bottom else self.max_lines * 2
+        if self.line_count() <= limit:
+            return
+        self._busy = True
+        state = self.widget.cget("state")
+        self.widget.configure(state="normal")
+        try:
+            while self.line_count() > self.max_lines:
+                if self._top_chunk < len(self._chunks):
+                    # previously paged-in chunk: already on disk, just drop it
+                    nlines = self._chunks[self._top_chunk][2]
+                else:
+                    nlines = self.chunk_lines
+                    self._spill(self.widget.get("1.0", f"{nlines + 1}.0"), nlines)
+                self.widget.delete("1.0", f"{nlines + 1}.0")
+                self._top_chunk += 1
+        finally:
+            self.widget.configure(state=state)
+            self.widget.edit_modified(False)
+            self._busy = False
+
+    def page_in(self):
+        """Load the most recent on-disk chunk above the current top of the widget."""
+        if self._log.closed or self._top_chunk == 0 or self.widget.yview()[0] > 0.0:
+            return
+        self._busy = True
+        self._top_chunk -= 1
+        offset, nbytes, nlines, tags = self._chunks[self._top_chunk]
+        self._log.flush()
+        self._log.seek(offset)
+        text = self._log.read(nbytes).decode("utf-8")
+        state = self.widget.cget("state")
+        self.widget.configure(state="normal")
+        try:
+            self.widget.insert("1.0", text, "history")
+            # the chunk starts at 1.0 again, so the indices recorded at spill time still fit
+            for tag, start, end in tags:
+                self.widget.tag_add(tag, start, end)
+            # keep the line the user was looking at in place
+            self.widget.yview_moveto(nlines / max(1, self.line_count()))
+        finally:
+            self.widget.configure(state=state)
+            self.widget.edit_modified(False)
+            self._busy = False
+
+    def _spill(self, text, nlines):
+        end = f"{nlines + 1}.0"
+        tags = []
+        for tag in self.widget.tag_names():
+            if tag in ("sel", "history"):
+                continue
+            ranges = self.widget.tag_ranges(tag)
+            for start, stop in zip(ranges[::2], ranges[1::2]):
+                if not self.widget.compare(start, "<", end):
+                    break
+                stop = stop if self.widget.compare(stop, "<", end) else end
+                tags.append((tag, str(start), str(stop)))
+        data = text.encode("utf-8")
+        self._log.seek(0, os.SEEK_END)
+        self._chunks.append((self._log.tell(), len(data), nlines, tags))
+        self._log.write(data)
+
+    def close(self):
+        if self._log.closed:
+            return
+        self._log.close()
+        if self._owns_log:
+            try:
+                os.unlink(self.log_path)
+            except OSError:
+                pass
@@ -0,0 +1,150 @@
+import re
+import threading
+import zlib
+
+import numpy as np
+
+# -------------------------------------------------------------
+#  Semantic nearest-neighbour response cache
+#  ------------------------------------------------------------
+#  • Prompts are embedded as a hashed bag of stemmed content words and
+#    content-word bigrams, with function words ("do", "can", "to", "the")
+#    at a low weight; no model download, microseconds per prompt
+#  • So rewordings that differ in function words, contractions or
+#    inflection hit ("How can I / How do I reverse a list", "What's /
+#    What is ..."); synonyms do not ("hi" / "hello") - it is a lexical
+#    match, not a learned embedding
+#  • Vectors live in one preallocated float32 matrix; a lookup is a
+#    single matrix-vector product over the filled rows
+#  • A hit needs cosine similarity >= threshold and the same numbers
+#    and negation / polarity words as the cached prompt: "largest
+#    prime below 100" must not get the answer for "smallest prime
+#    below 1000", however close the vectors are
+#  • The least recently used entry is overwritten when the cache is full
+# -------------------------------------------------------------
+
+_NORMALIZE = re.compile(r"[^a-z0-9 ]+")
+_CONTRACTIONS = (
+    (re.compile(r"\b(can|won)'t\b"), lambda m: {"can": "cannot", "won": "will not"}[m.group(1)]),
+    (re.compile(r"n't\b"), lambda m: " not"),
+    (re.compile(r"'(s|re|ll|ve|d|m)\b"), lambda m: ""),
+)
+_FUNCTION_WORDS = frozenset(
+    "a an the is are was were be been am do does did can could would should will shall may might must "
+    "i me my you your we our it its to of in on for with at by from into that this these those and or "
+    "so then please".split())
+_SUFFIXES = ("ing", "ed", "es", "s")
+FUNCTION_WEIGHT = 0.2
+# words that point back into the conversation; such a prompt means nothing on its own
+_REFERS_BACK = frozenset(
+    "it its that this these those they them their he she him her his above previous earlier again "
+    "instead also another more other same".split())
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_NEGATIONS = frozenset(
+    "not no never none nor without cannot cant dont doesnt didnt isnt arent wasnt werent wont wouldnt "
+    "shouldnt couldnt except".split())
+# one side of each pair is enough to tell "sort ascending" from "sort descending"
+_POLARITY = frozenset(
+    "largest smallest biggest tiniest longest shortest highest lowest most least more less max min maximum "
+    "minimum increase decrease ascending descending before after above below first last best worst fastest "
+    "slowest true false add remove encode decode encrypt decrypt upper lower start end open close left right "
+    "positive negative import export push pop even odd".split())
+
+
+def guard_tokens(text: str):
+    """Numbers and negation/polarity words; prompts that differ in these never share an answer."""
+    text = text.lower().replace("'", "").replace("\u2019", "")
+    words = set(_NORMALIZE.sub(" ", text).split())
+    return tuple(sorted(_NUMBER.findall(text))), frozenset(words & (_NEGATIONS | _POLARITY))
+
+
+def _stem(word):
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            word = word[:-len(suffix)]
+            break
+    return word[:-1] if word.endswith("e") and len(word) > 3 else word
+
+
+def _words(text):
+    text = text.lower().replace("\u2019", "'")
+    for pattern, sub in _CONTRACTIONS:
+        text = pattern.sub(sub, text)
+    return _NORMALIZE.sub(" ", text).split()
+
+
+def refers_back(text: str) -> bool:
+    """True if the prompt leans on earlier turns ("make it shorter"), so a cached answer cannot fit."""
+    return not _REFERS_BACK.isdisjoint(_words(text))
+
+
+class HashedNgramVectorizer:
+    def __init__(self, dim=2048):
+        self.dim = dim
+
+    def __call__(self, text: str):
+        words = _words(text)
+        content = [_stem(w) for w in words if w not in _FUNCTION_WORDS]
+        features = [("w:" + w, 1.0) for w in content]
+        features += [("b:" + a + " " + b, 1.0) for a, b in zip(content, content[1:])]
+        features += [("f:" + w, FUNCTION_WEIGHT) for w in words if w in _FUNCTION_WORDS]
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in features:
+            h = zlib.crc32(feature.encode())
+            # sign bit keeps colliding features from only ever adding up
+            vec[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+
+class SemanticCache:
+    def __init__(self, threshold=0.95, capacity=1024, vectorizer=None):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.vectorize = vectorizer or HashedNgramVectorizer()
+        self._matrix = np.zeros((capacity, self.vectorize.dim), dtype=np.float32)
+        self._responses = [None] * capacity
+        self._guards = [None] * capacity
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def lookup(self, prompt: str):
+        """Return (value, similarity) of the closest cached prompt, or (None, best similarity)."""
+        vec, guard = self.vectorize(prompt), guard_tokens(prompt)
+        with self._lock:
+            if not self._size:
+                self.misses += 1
+                return None, 0.0
+            sims = self._matrix[:self._size] @ vec
+            # closest entry that also agrees on numbers and polarity
+            candidates = [i for i in np.flatnonzero(sims >= self.threshold) if self._guards[i] == guard]
+            if not candidates:
+                self.misses += 1
+                return None, float(sims.max())
+            best = max(candidates, key=lambda i: sims[i])
+            similarity = float(sims[best])
+            self._clock += 1
+            self._last_used[best] = self._clock
+            self.hits += 1
+            return self._responses[best], similarity
+
+    def store(self, prompt: str, value):
+        """Cache any value (e.g. the bare reply) under *prompt*; lookup() returns it as is."""
+        vec = self.vectorize(prompt)
+        with self._lock:
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._matrix[slot] = vec
+            self._responses[slot] = value
+            self._guards[slot] = guard_tokens(prompt)
+            self._clock += 1
+            self._last_used[slot] = self._clock
+
+    def __len__(self):
+        return self._size
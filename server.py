@@ -0,0 +1,372 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import PRIORITIES, AdmissionController, Rejected
+from engines import ENGINES, load_engine
+import metrics
+from router import load_router
+
+# -------------------------------------------------------------
+#  OpenAI-compatible local HTTP server
+#  ------------------------------------------------------------
+#  • POST /v1/chat/completions and /v1/completions, GET /v1/models
+#  • "stream": true answers with server-sent events over chunked
+#    transfer encoding, so connections stay keep-alive
+#  • Pure asyncio streams; the engine runs on a small executor so
+#    many clients share one loaded model
+#  • Admission control: bounded queue, per-request deadlines and
+#    interactive/batch priority ("X-Priority" / "X-Deadline-Ms"
+#    headers or "priority" / "deadline_ms" body fields); rejected
+#    requests get 429 with Retry-After instead of waiting forever
+#  • GET /metrics: per-stage latency histograms (Prometheus text)
+#  • --workers N loads the weights once, then forks N workers that
+#    share them copy-on-write and accept on one listening socket
+#  • Several --engine flags put the engines (or replicas, by repeating
+#    a name) behind a hedged / fan-out router, see router.py
+#  Usage: python server.py --engine deepseek-7b --port 8000
+# -------------------------------------------------------------
+
+KEEPALIVE_S = 60
+MAX_BODY = 4 * 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class StreamAborted(Exception):
+    """The engine failed after the SSE headers went out; the client got an error event."""
+
+
+class Shutdown(BaseException):
+    """SIGTERM in the pre-fork parent; handled like Ctrl-C."""
+
+
+def prompt_from_messages(messages):
+    """The engines take a single user turn; use the latest one."""
+    if not isinstance(messages, list) or not all(isinstance(msg, dict) for msg in messages):
+        raise HTTPError(400, "messages must be a list of objects")
+    for msg in reversed(messages):
+        if msg.get("role") == "user":
+            content = msg.get("content", "")
+            if isinstance(content, list):  # [{"type": "text", "text": ...}]
+                if not all(isinstance(part, dict) and part.get("type") == "text" and isinstance(part.get("text"), str)
+                           for part in content):
+                    raise HTTPError(400, "content parts must be {\"type\": \"text\", \"text\": string} objects")
+                content = "".join(part["text"] for part in content)
+            if not isinstance(content, str):
+                raise HTTPError(400, "message content must be a string or a list of text parts")
+            return content
+    raise HTTPError(400, "messages must contain a user message")
+
+
+class CompletionServer:
+    def __init__(self, engine, concurrency=1, admission=None):
+        self.engine = engine
+        # one worker by default: a loaded model is not safe to call concurrently
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="engine")
+        self.admission = admission or AdmissionController(slots=concurrency)
+
+    # ---------- connection handling ------------------------------------
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEPALIVE_S)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as e:
+                    # the body cannot be framed, so the connection cannot be reused
+                    await self._send_json(writer, e.status, {"error": {"message": str(e), "type": "invalid_request_error"}}, False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self._route(writer, method, path, headers, body, keep_alive)
+                except Rejected as e:
+                    metrics.inc("catgpt_rejected_total", 1, "Requests refused by admission control")
+                    retry = {"Retry-After": str(max(1, round(e.retry_after)))}
+                    await self._send_json(writer, 429, {"error": {"message": str(e), "type": "overloaded"}},
+                                          keep_alive, retry)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": {"message": str(e), "type": "invalid_request_error"}}, keep_alive)
+                except (ConnectionError, StreamAborted):
+                    break
+                except Exception as e:
+                    await self._send_json(writer, 500, {"error": {"message": str(e), "type": "server_error"}}, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, version = line.decode("latin-1").split()
+        except ValueError:
+            return None
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = h.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+            headers["connection"] = "close"
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HTTPError(400, "Content-Length must be an integer") from None
+        if length < 0:
+            raise HTTPError(400, "Content-Length must not be negative")
+        if length > MAX_BODY:
+            raise ConnectionError("request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], headers, body
+
+    async def _route(self, writer, method, path, headers, body, keep_alive):
+        if path == "/metrics":
+            data = metrics.REGISTRY.render().encode()
+            writer.write(self._head(200, "text/plain; version=0.0.4", keep_alive, length=len(data)) + b"\r\n" + data)
+            return await writer.drain()
+        if path == "/v1/models":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            data = [{"id": self.engine.name, "object": "model", "owned_by": "local"}]
+            return await self._send_json(writer, 200, {"object": "list", "data": data}, keep_alive)
+        if path not in ("/v1/chat/completions", "/v1/completions"):
+            raise HTTPError(404, f"no route for {path}")
+        if method != "POST":
+            raise HTTPError(405, "use POST")
+        try:
+            req = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON")
+        if not isinstance(req, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        chat = path == "/v1/chat/completions"
+        prompt = prompt_from_messages(req.get("messages")) if chat else str(req.get("prompt", ""))
+        priority_name = headers.get("x-priority") or req.get("priority") or "interactive"
+        if priority_name not in PRIORITIES:
+            raise HTTPError(400, f"priority must be one of {', '.join(PRIORITIES)}")
+        deadline_ms = headers.get("x-deadline-ms") or req.get("deadline_ms")
+        deadline_s = None
+        if deadline_ms is not None and deadline_ms != "":
+            try:
+                deadline_s = float(deadline_ms) / 1000
+            except (TypeError, ValueError):
+                raise HTTPError(400, "deadline_ms must be a number") from None
+            if not 0 < deadline_s < float("inf"):
+                raise HTTPError(400, "deadline_ms must be a positive number")
+        queued_at = time.perf_counter()
+        async with self.admission.admit(PRIORITIES[priority_name], deadline_s):
+            metrics.observe("catgpt_stage_seconds", time.perf_counter() - queued_at,
+                            "Time spent per generation pipeline stage", stage="queue")
+            if req.get("stream"):
+                await self._stream(writer, prompt, chat, keep_alive)
+            else:
+                await self._complete(writer, prompt, chat, keep_alive)
+
+    # ---------- completions --------------------------------------------
+    def _envelope(self, chat, stream):
+        kind = ("chat.completion" if chat else "text_completion") + (".chunk" if stream and chat else "")
+        prefix = "chatcmpl-" if chat else "cmpl-"
+        return {"id": prefix + uuid.uuid4().hex[:24], "object": kind,
+                "created": int(time.time()), "model": self.engine.name}
+
+    async def _complete(self, writer, prompt, chat, keep_alive):
+        loop = asyncio.get_running_loop()
+        with metrics.stage("engine"):
+            text = await loop.run_in_executor(self.executor, self.engine.generate, prompt)
+        body = self._envelope(chat, stream=False)
+        choice = {"index": 0, "finish_reason": "stop"}
+        if chat:
+            choice["message"] = {"role": "assistant", "content": text}
+        else:
+            choice.update(text=text, logprobs=None)
+        body["choices"] = [choice]
+        prompt_tokens, completion_tokens = len(prompt.split()), len(text.split())
+        body["usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                         "total_tokens": prompt_tokens + completion_tokens}
+        await self._send_json(writer, 200, body, keep_alive)
+
+    async def _stream(self, writer, prompt, chat, keep_alive):
+        loop = asyncio.get_running_loop()
+        envelope = self._envelope(chat, stream=True)
+        pieces = self.engine.stream(prompt)
+        done = object()
+        writer.write(self._head(200, "text/event-stream", keep_alive, chunked=True)
+                     + b"Cache-Control: no-cache\r\n\r\n")
+
+        async def event(choice):
+            data = b"data: " + json.dumps(dict(envelope, choices=[choice])).encode() + b"\n\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+
+        try:
+            if chat:
+                await event({"index": 0, "delta": {"role": "assistant"}, "finish_reason": None})
+            while True:
+                piece = await loop.run_in_executor(self.executor, next, pieces, done)
+                if piece is done:
+                    break
+                delta = {"delta": {"content": piece}} if chat else {"text": piece, "logprobs": None}
+                await event(dict(index=0, finish_reason=None, **delta))
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # headers are out: a 500 now would land inside the chunked body
+            err = b"data: " + json.dumps({"error": {"message": str(e), "type": "server_error"}}).encode() + b"\n\n"
+            writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(err), err))
+            await writer.drain()
+            raise StreamAborted(str(e)) from e
+        finally:
+            # on the engine thread: closing a model stream joins its decode, which must not block the loop
+            await loop.run_in_executor(self.executor, pieces.close)
+        await event(dict(index=0, finish_reason="stop", **({"delta": {}} if chat else {"text": ""})))
+        tail = b"data: [DONE]\n\n"
+        writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(tail), tail))
+        await writer.drain()
+
+    # ---------- responses ----------------------------------------------
+    @staticmethod
+    def _head(status, content_type, keep_alive, length=None, chunked=False):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                 f"Content-Type: {content_type}",
+                 "Connection: " + ("keep-alive" if keep_alive else "close")]
+        if chunked:
+            lines.append("Transfer-Encoding: chunked")
+        if length is not None:
+            lines.append(f"Content-Length: {length}")
+        return ("\r\n".join(lines) + "\r\n").encode("latin-1")
+
+    async def _send_json(self, writer, status, obj, keep_alive, extra_headers=None):
+        data = json.dumps(obj).encode()
+        extra = "".join(f"{k}: {v}\r\n" for k, v in (extra_headers or {}).items()).encode("latin-1")
+        writer.write(self._head(status, "application/json", keep_alive, length=len(data)) + extra + b"\r\n" + data)
+        await writer.drain()
+
+    async def serve(self, host=None, port=None, sock=None):
+        if sock is not None:
+            server = await asyncio.start_server(self.handle, sock=sock)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            print(f"[CatGPT server] {self.engine.name} on http://{host}:{port}/v1")
+        async with server:
+            await server.serve_forever()
+
+
+# ---------- pre-fork workers -------------------------------------------
+def _limit_threads(workers):
+    # N workers each running full-width intra-op pools would oversubscribe the CPU
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+def serve_workers(engine, host, port, workers, concurrency=1, max_queue=32):
+    """Fork *workers* processes that share the already-loaded engine."""
+    if not hasattr(os, "fork"):
+        sys.exit("--workers needs os.fork(); run a single worker on this platform")
+    engine.share_weights()
+    sock = socket.create_server((host, port), backlog=512)
+    sock.setblocking(False)
+    # Move everything loaded so far out of the collector's reach: gc passes
+    # would otherwise write to every object header and un-share the pages
+    gc.freeze()
+    print(f"[CatGPT server] {engine.name} on http://{host}:{port}/v1 ({workers} workers)")
+
+    children = {}
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                _limit_threads(workers)
+                admission = AdmissionController(slots=concurrency, max_queue=max_queue)
+                asyncio.run(CompletionServer(engine, concurrency, admission).serve(sock=sock))
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = slot
+
+    def terminate(signum, frame):
+        raise Shutdown
+
+    signal.signal(signal.SIGTERM, terminate)
+    for slot in range(workers):
+        spawn(slot)
+    stopping = False
+    try:
+        while children:
+            pid, status = os.wait()
+            slot = children.pop(pid, None)
+            if slot is not None and not stopping:
+                print(f"[CatGPT server] worker {slot} exited (status {status}), restarting")
+                spawn(slot)
+    except (KeyboardInterrupt, Shutdown):
+        stopping = True
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        for pid in list(children):
+            os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible server for the local engines")
+    parser.add_argument("--engine", action="append", choices=sorted(ENGINES),
+                        help="engine to serve; repeat to route across several (default o3-mini-copycat)")
+    parser.add_argument("--route", default="hedge", choices=("hedge", "fanout"),
+                        help="how several engines share a request")
+    parser.add_argument("--hedge-after", type=float, default=None,
+                        help="seconds before a hedged duplicate is sent (default: the engine's p95)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="parallel engine calls per worker (keep 1 for model engines)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="forked worker processes sharing one copy of the weights")
+    parser.add_argument("--max-queue", type=int, default=32,
+                        help="requests allowed to wait per worker before shedding")
+    args = parser.parse_args()
+    metrics.install_from_env()
+    names = args.engine or ["o3-mini-copycat"]
+    if len(names) > 1:
+        engine = load_router(names, mode=args.route, hedge_after_s=args.hedge_after)
+    else:
+        engine = load_engine(names[0])
+    if args.workers > 1:
+        return serve_workers(engine, args.host, args.port, args.workers, args.concurrency, args.max_queue)
+    admission = AdmissionController(slots=args.concurrency, max_queue=args.max_queue)
+    server = CompletionServer(engine, concurrency=args.concurrency, admission=admission)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+
+import metrics
+
+# -------------------------------------------------------------
+#  Opt-in stall detector for the Tk event loop
+#  ------------------------------------------------------------
+#  • A heartbeat after() callback measures scheduling jitter
+#  • A monitor thread notices when the heartbeat is overdue and
+#    samples the Tk thread's stack while it is still stuck
+#  • When the loop recovers, the stall is logged with its duration
+#    and the handler that was running
+#  • stats() (stall count, worst heartbeat jitter) is also exported
+#    as catgpt_tk_* metrics
+#  Enable with CATGPT_WATCHDOG=1 (threshold: CATGPT_WATCHDOG_MS)
+# -------------------------------------------------------------
+
+log = logging.getLogger("catgpt.watchdog")
+
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+
+class StallWatchdog:
+    """Logs Tk callbacks that block the event loop longer than threshold_ms."""
+
+    INTERVAL_MS = 50
+    MAX_SAMPLES = 20
+
+    def __init__(self, root, threshold_ms=200):
+        self.root = root
+        self.threshold = threshold_ms / 1000
+        self.tk_thread_id = threading.get_ident()  # must be created on the Tk thread
+        self.stalls = 0
+        self.max_jitter_ms = 0.0
+        self._expected = time.perf_counter() + self.INTERVAL_MS / 1000
+        self._last_beat = time.perf_counter()
+        self._samples = []
+        self._lock = threading.Lock()
+        self._running = True
+        root.after(self.INTERVAL_MS, self._beat)
+        threading.Thread(target=self._monitor, name="catgpt-watchdog", daemon=True).start()
+        metrics.collect("catgpt_tk_stalls_total", lambda: self.stalls, "Tk event loop stalls over the threshold", kind="counter")
+        metrics.collect("catgpt_tk_max_jitter_ms", lambda: round(self.max_jitter_ms, 1),
+                        "Worst lateness of the Tk heartbeat callback")
+
+    @classmethod
+    def install_from_env(cls, root):
+        """Start a watchdog if CATGPT_WATCHDOG is set; returns it or None."""
+        if not os.environ.get("CATGPT_WATCHDOG"):
+            return None
+        return cls(root, threshold_ms=float(os.environ.get("CATGPT_WATCHDOG_MS", "200")))
+
+    def stop(self):
+        self._running = False
+
+    def stats(self):
+        return {"stalls": self.stalls, "max_jitter_ms": round(self.max_jitter_ms, 1)}
+
+    # ---------- Tk thread ----------------------------------------------
+    def _beat(self):
+        now = time.perf_counter()
+        jitter_ms = (now - self._expected) * 1000
+        self.max_jitter_ms = max(self.max_jitter_ms, jitter_ms)
+        with self._lock:
+            stalled_for = now - self._last_beat
+            samples, self._samples = self._samples, []
+            self._last_beat = now
+        if samples:
+            self.stalls += 1
+            self._report(stalled_for, samples)
+        if self._running:
+            self._expected = time.perf_counter() + self.INTERVAL_MS / 1000
+            self.root.after(self.INTERVAL_MS, self._beat)
+
+    def _report(self, duration, samples):
+        handler = self._handler_name(samples[0])
+        # most frequently sampled stack is where the time went
+        stack = max(set(samples), key=samples.count)
+        log.warning(
+            "Tk event loop stalled for %.0f ms in %s (%d samples, worst jitter so far %.0f ms)\n%s",
+            duration * 1000, handler, len(samples), self.max_jitter_ms, stack,
+        )
+
+    @staticmethod
+    def _handler_name(stack):
+        # innermost frame outside tkinter/stdlib is the offending handler
+        for line in reversed(stack.splitlines()):
+            line = line.strip()
+            if line.startswith("File ") and _STDLIB not in line:
+                return line
+        return "<unknown>"
+
+    # ---------- monitor thread -----------------------------------------
+    def _monitor(self):
+        period = self.INTERVAL_MS / 2000
+        while self._running:
+            time.sleep(period)
+            with self._lock:
+                overdue = time.perf_counter() - self._last_beat - self.INTERVAL_MS / 1000
+                if overdue < self.threshold or len(self._samples) >= self.MAX_SAMPLES:
+                    continue
+                frame = sys._current_frames().get(self.tk_thread_id)
+                if frame is not None:
+                    self._samples.append("".join(traceback.format_stack(frame)))
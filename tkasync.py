@@ -0,0 +1,91 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------------------------------------------------
+#  asyncio event loop running alongside the Tk mainloop
+#  ------------------------------------------------------------
+#  • One background thread runs the asyncio loop for the whole app
+#  • GUI handlers schedule coroutines with submit(); results come
+#    back on the Tk thread through the UIDispatcher
+#  • Blocking calls (model.generate, downloads, sandbox exec) share a
+#    small bounded pool instead of one OS thread per request
+# -------------------------------------------------------------
+
+
+class TkAsyncLoop:
+    """Bridge between Tk callbacks and an asyncio loop on a helper thread."""
+
+    def __init__(self, ui, max_blocking=4):
+        self.ui = ui
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=max_blocking, thread_name_prefix="catgpt-blocking")
+        self.loop.set_default_executor(self.executor)
+        self._thread = threading.Thread(target=self._run, name="catgpt-asyncio", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    # ---------- Tk thread -> loop --------------------------------------
+    def submit(self, coro, timeout=None, on_done=None, on_error=None):
+        """Schedule *coro*; on_done(result) / on_error(exc) run on the Tk thread.
+
+        Returns a concurrent.futures.Future whose cancel() cancels the coroutine.
+        Errors without an on_error handler go to Tk's report_callback_exception.
+        """
+        if timeout is not None:
+            coro = asyncio.wait_for(coro, timeout)
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+        def deliver(f):
+            if f.cancelled():
+                return
+            exc = f.exception()
+            if exc is None:
+                if on_done is not None:
+                    self.ui.post(on_done, f.result())
+            elif on_error is not None:
+                self.ui.post(on_error, exc)
+            else:
+                self.ui.post(self.ui.report, exc)
+
+        future.add_done_callback(deliver)
+        return future
+
+    def handler(self, async_fn):
+        """Wrap an async function so it can be used as a Tk command or binding."""
+        @functools.wraps(async_fn)
+        def wrapper(*args):
+            return self.submit(async_fn(*args))
+        return wrapper
+
+    # ---------- inside coroutines --------------------------------------
+    async def run_blocking(self, fn, *args, **kwargs):
+        """Await a blocking call on the shared pool."""
+        return await self.loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    async def on_ui(self, fn, *args):
+        """Await fn(*args) executed on the Tk thread."""
+        future = self.loop.create_future()
+
+        def settle(setter, value):
+            if not future.done():
+                setter(value)
+
+        def call():
+            try:
+                result = fn(*args)
+            except Exception as e:
+                self.loop.call_soon_threadsafe(settle, future.set_exception, e)
+            else:
+                self.loop.call_soon_threadsafe(settle, future.set_result, result)
+
+        self.ui.post(call)
+        return await future
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.executor.shutdown(wait=False, cancel_futures=True)